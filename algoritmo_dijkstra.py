@@ -29,9 +29,10 @@ def dijkstra(grafo, inicio):
 
 def reconstruir_caminho(anteriores, destino):
     caminho = []
-    while destino:
-        caminho.insert(0, destino)  # Insere no início da lista
+    while destino is not None:  # Nós como 0 ou '' também são válidos
+        caminho.append(destino)  # Monta de trás para frente
         destino = anteriores[destino]  # Vai para o nó anterior
+    caminho.reverse()  # Inverter no fim é linear; inserir no início seria quadrático
     return caminho
 
 def encontrar_hospital_mais_proximo(grafo, pos_ambulancia, hospitais):
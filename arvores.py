@@ -0,0 +1,195 @@
+import heapq
+from array import array
+
+import instrumentacao
+
+
+class ArvoreCaminhos:
+    # Árvore de menores caminhos a partir de `raiz`, guardada em arrays
+    # compactos (distância e anterior de cada id do CSR). Fica registrada
+    # como observadora do grafo: quando um peso muda, só a parte afetada da
+    # árvore é recalculada, sem rodar o Dijkstra de novo na cidade toda.
+    def __init__(self, grafo, raiz):
+        grafo.compilar()
+        self._compacto = grafo.como_compacto()
+        self.raiz = raiz
+
+        n = len(self._compacto)
+        self.distancias = array('d', [float('inf')]) * n
+        self.anteriores = array('q', [-1]) * n
+
+        self._recalcular()
+        grafo.observar(self)
+
+    def _recalcular(self):
+        n = len(self._compacto)
+        self.distancias[:] = array('d', [float('inf')]) * n
+        self.anteriores[:] = array('q', [-1]) * n
+        inicio = self._compacto.indices[self.raiz]
+        self.distancias[inicio] = 0
+        self._propagar([(0, inicio)])
+
+    def _propagar(self, fila):
+        # Dijkstra a partir das entradas já colocadas na fila, reaproveitando
+        # as distâncias que continuam válidas.
+        g = self._compacto
+        inicios, destinos, pesos = g.inicios, g.destinos, g.pesos
+        distancias, anteriores = self.distancias, self.anteriores
+        heapq.heapify(fila)
+
+        retiradas = descartadas = 0
+        while fila:
+            distancia_atual, no_atual = heapq.heappop(fila)
+            retiradas += 1
+            if distancia_atual > distancias[no_atual]:
+                descartadas += 1
+                continue
+
+            for k in range(inicios[no_atual], inicios[no_atual + 1]):
+                vizinho = destinos[k]
+                nova_distancia = distancia_atual + pesos[k]
+                if nova_distancia < distancias[vizinho]:
+                    distancias[vizinho] = nova_distancia
+                    anteriores[vizinho] = no_atual
+                    heapq.heappush(fila, (nova_distancia, vizinho))
+
+        if instrumentacao.ativo:
+            instrumentacao.busca('arvore', retiradas, descartadas, 0)
+
+    def _afetados(self, alteracoes):
+        # Nós cuja distância pode ter piorado. Parte dos filhos das arestas da
+        # árvore que ficaram mais caras e desce pela subárvore em ordem de
+        # distância; um nó que tenha outro pai, fora da região afetada, com a
+        # mesma distância, só troca de pai e a subárvore dele fica intacta.
+        g = self._compacto
+        inicios, destinos, pesos = g.inicios, g.destinos, g.pesos
+        distancias, anteriores = self.distancias, self.anteriores
+
+        candidatos = []
+        for u, v, antigo, novo in alteracoes:
+            if novo > antigo:
+                for pai, filho in ((u, v), (v, u)):
+                    if anteriores[filho] == pai:
+                        candidatos.append((distancias[filho], filho))
+        heapq.heapify(candidatos)
+        pendentes = {no for _, no in candidatos}
+        afetados = set()
+
+        while candidatos:
+            distancia, no = heapq.heappop(candidatos)
+            if no not in pendentes:
+                continue
+            pendentes.discard(no)
+
+            for k in range(inicios[no], inicios[no + 1]):
+                vizinho = destinos[k]
+                # Peso positivo garante que o vizinho tem distância menor e
+                # portanto já foi classificado (não é descendente de `no`).
+                if (pesos[k] > 0 and distancias[vizinho] + pesos[k] == distancia
+                        and vizinho not in afetados and vizinho not in pendentes):
+                    anteriores[no] = vizinho
+                    break
+            else:
+                afetados.add(no)
+                for k in range(inicios[no], inicios[no + 1]):
+                    filho = destinos[k]
+                    if anteriores[filho] == no and filho not in pendentes:
+                        pendentes.add(filho)
+                        heapq.heappush(candidatos, (distancias[filho], filho))
+
+        return afetados
+
+    def arestas_alteradas(self, alteracoes):
+        # Reparo incremental (no estilo de Ramalingam e Reps): aumentos em
+        # arestas da árvore invalidam só os nós que ficaram sem caminho de
+        # mesmo custo; esses voltam a infinito e são semeados pelos vizinhos
+        # que seguem válidos. Reduções entram como sementes diretas. Uma única
+        # propagação resolve todas as alterações do lote.
+        g = self._compacto
+        inicios, destinos, pesos = g.inicios, g.destinos, g.pesos
+        distancias, anteriores = self.distancias, self.anteriores
+        infinito = float('inf')
+
+        invalidos = self._afetados(alteracoes)
+        if len(invalidos) > len(distancias) // 4:
+            # Com boa parte da árvore invalidada, refazer do zero sai mais
+            # barato que semear cada nó pela vizinhança.
+            self._recalcular()
+            return
+
+        for no in invalidos:
+            distancias[no] = infinito
+            anteriores[no] = -1
+
+        fila = []
+        for no in invalidos:
+            for k in range(inicios[no], inicios[no + 1]):
+                vizinho = destinos[k]
+                nova_distancia = distancias[vizinho] + pesos[k]
+                if nova_distancia < distancias[no]:
+                    distancias[no] = nova_distancia
+                    anteriores[no] = vizinho
+            if distancias[no] < infinito:
+                fila.append((distancias[no], no))
+
+        for u, v, antigo, novo in alteracoes:
+            if novo < antigo:
+                for a, b in ((u, v), (v, u)):
+                    nova_distancia = distancias[a] + novo
+                    if nova_distancia < distancias[b]:
+                        distancias[b] = nova_distancia
+                        anteriores[b] = a
+                        fila.append((nova_distancia, b))
+
+        self._propagar(fila)
+
+    def _valor(self, distancia):
+        # As distâncias ficam em double; com pesos inteiros devolvemos int,
+        # como o Grafo.dijkstra faria.
+        if self._compacto.pesos_inteiros and distancia != float('inf'):
+            return int(distancia)
+        return distancia
+
+    def distancia(self, nome):
+        return self._valor(self.distancias[self._compacto.indices[nome]])
+
+    def caminho_ate(self, nome):
+        # raiz -> nome
+        caminho = self.caminho_de(nome)
+        caminho.reverse()
+        return caminho
+
+    def caminho_de(self, nome):
+        # nome -> raiz, seguindo os anteriores sem precisar inverter.
+        g = self._compacto
+        no = g.indices[nome]
+        if self.distancias[no] == float('inf'):
+            return []
+        caminho = []
+        while no >= 0:
+            caminho.append(g.nomes[no])
+            no = self.anteriores[no]
+        return caminho
+
+
+class TabelaHospitais:
+    # Distâncias e anteriores de cada hospital para todos os nós. Como as
+    # ruas são de mão dupla, a mesma árvore responde a ida (hospital ->
+    # ocorrência) e a volta (ocorrência -> hospital).
+    def __init__(self, grafo, hospitais):
+        with instrumentacao.etapa('arvores.tabela_hospitais'):
+            self.arvores = {hospital: ArvoreCaminhos(grafo, hospital) for hospital in hospitais}
+
+    def ida(self, hospital, destino):
+        arvore = self.arvores[hospital]
+        return arvore.distancia(destino), arvore.caminho_ate(destino)
+
+    def volta(self, origem, hospital):
+        arvore = self.arvores[hospital]
+        return arvore.distancia(origem), arvore.caminho_de(origem)
+
+    def rota(self, hospital, destino):
+        with instrumentacao.etapa('arvores.rota'):
+            tempo_ida, caminho_ida = self.ida(hospital, destino)
+            tempo_volta, caminho_volta = self.volta(destino, hospital)
+        return tempo_ida, caminho_ida, tempo_volta, caminho_volta
@@ -0,0 +1,47 @@
+import argparse
+import random
+import time
+
+from benchmarks.geradores import gerar_grade
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Mede o reparo incremental de árvores de caminhos sob atualizações de peso em lote.")
+    parser.add_argument('--lado', type=int, default=200, help="grade lado x lado")
+    parser.add_argument('--arvores', type=int, default=4, help="árvores mantidas (ex.: hospitais)")
+    parser.add_argument('--lotes', type=int, nargs='+', default=[1, 10, 100, 1000],
+                        help="tamanhos de lote a medir")
+    parser.add_argument('--repeticoes', type=int, default=10, help="lotes medidos de cada tamanho")
+    parser.add_argument('--semente', type=int, default=0)
+    args = parser.parse_args()
+
+    aleatorio = random.Random(args.semente)
+    grafo = gerar_grade(args.lado, args.semente)
+    nomes = list(grafo.adjacencias)
+    arvores = [grafo.arvore_caminhos(nome) for nome in aleatorio.sample(nomes, args.arvores)]
+    arestas = [(origem, destino) for origem in nomes for destino, _ in grafo.adjacencias[origem]]
+
+    inicio = time.perf_counter()
+    for arvore in arvores:
+        grafo.dijkstra(arvore.raiz)
+    tempo_completo = time.perf_counter() - inicio
+    print(f"{len(nomes)} nós, {args.arvores} árvores; Dijkstra completo em todas: {tempo_completo * 1e3:.1f} ms")
+
+    for tamanho in args.lotes:
+        inicio = time.perf_counter()
+        for _ in range(args.repeticoes):
+            lote = [(*aleatorio.choice(arestas), aleatorio.randint(1, 10)) for _ in range(tamanho)]
+            grafo.atualizar_pesos(lote)
+        tempo = (time.perf_counter() - inicio) / args.repeticoes
+        print(f"lote de {tamanho:>5}: reparo em {tempo * 1e3:8.1f} ms "
+              f"({tamanho / tempo:10,.0f} alterações/s)")
+
+    for arvore in arvores[:1]:
+        distancias, _ = grafo.dijkstra(arvore.raiz)
+        if any(arvore.distancia(nome) != distancias[nome] for nome in nomes):
+            raise SystemExit("árvore reparada diverge do Dijkstra")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.geradores import gerar_grade
+
+
+# Partida a frio: cada carga roda num processo Python novo, que importa o
+# grafo.py e abre o arquivo, como faria o main.py ou o servico.py.
+_CARREGAR = """
+import sys, time
+inicio = time.perf_counter()
+from grafo import Grafo
+grafo = Grafo.carregar(sys.argv[1])
+print(time.perf_counter() - inicio)
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede gravação e carga (via mmap) do formato binário do grafo.")
+    parser.add_argument('--lado', type=int, default=710, help="grade lado x lado (710 ≈ 1 milhão de ruas)")
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--semente', type=int, default=0)
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    grafo = gerar_grade(args.lado, args.semente)
+    construcao = time.perf_counter() - inicio
+    compacto = grafo.como_compacto()
+    print(f"{len(compacto)} nós, {len(compacto.destinos) // 2} ruas; construção em memória: {construcao:.2f} s")
+
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, 'grade.grafo')
+        inicio = time.perf_counter()
+        grafo.salvar(caminho)
+        print(f"gravação: {time.perf_counter() - inicio:.2f} s ({os.path.getsize(caminho) / 2 ** 20:.1f} MiB)")
+
+        raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        for _ in range(args.repeticoes):
+            saida = subprocess.run([sys.executable, '-c', _CARREGAR, caminho], cwd=raiz,
+                                   capture_output=True, text=True, check=True)
+            print(f"carga a frio: {float(saida.stdout) * 1e3:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
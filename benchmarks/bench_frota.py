@@ -0,0 +1,48 @@
+import argparse
+import random
+import time
+
+from benchmarks.geradores import gerar_grade
+from frota import DespachoFrota, Hungaro
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Mede a montagem da matriz de custos e a atribuição ótima ambulâncias x ocorrências.")
+    parser.add_argument('--lado', type=int, default=100, help="grade lado x lado")
+    parser.add_argument('--ambulancias', type=int, default=500)
+    parser.add_argument('--ocorrencias', type=int, default=500)
+    parser.add_argument('--novas', type=int, default=20, help="ocorrências que chegam depois da solução inicial")
+    parser.add_argument('--semente', type=int, default=0)
+    args = parser.parse_args()
+
+    aleatorio = random.Random(args.semente)
+    grafo = gerar_grade(args.lado, args.semente)
+    nomes = list(grafo.adjacencias)
+    ambulancias = [aleatorio.choice(nomes) for _ in range(args.ambulancias)]
+    ocorrencias = [aleatorio.choice(nomes) for _ in range(args.ocorrencias + args.novas)]
+    iniciais, novas = ocorrencias[:args.ocorrencias], ocorrencias[args.ocorrencias:]
+
+    frota = DespachoFrota(grafo, ambulancias)
+    inicio = time.perf_counter()
+    custos = [frota.custos(ocorrencia) for ocorrencia in iniciais]
+    tempo_matriz = time.perf_counter() - inicio
+    print(f"{len(nomes)} nós; matriz {len(iniciais)} x {len(ambulancias)}: {tempo_matriz:.2f} s "
+          f"({tempo_matriz / len(iniciais) * 1e3:.1f} ms por ocorrência)")
+
+    inicio = time.perf_counter()
+    hungaro = Hungaro(len(ambulancias))
+    for linha in custos:
+        hungaro.adicionar_linha(linha)
+    print(f"atribuição ótima {len(iniciais)} x {len(ambulancias)}: {time.perf_counter() - inicio:.2f} s")
+
+    frota.adicionar_ocorrencias(iniciais)
+    inicio = time.perf_counter()
+    frota.adicionar_ocorrencias(novas)
+    incremental = (time.perf_counter() - inicio) / max(len(novas), 1)
+    print(f"ocorrência nova (busca + fase incremental): {incremental * 1e3:.1f} ms cada; "
+          f"tempo total da frota: {frota.tempo_total()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+import argparse
+import math
+import random
+import time
+
+from benchmarks.geradores import gerar_grade
+from hierarquia import HierarquiaContracao
+
+
+def medir(tamanho, consultas, semente):
+    lado = max(2, math.isqrt(tamanho))
+    inicio = time.perf_counter()
+    grafo = gerar_grade(lado, semente)
+    tempo_grafo = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    hierarquia = HierarquiaContracao.construir(grafo)
+    tempo_construcao = time.perf_counter() - inicio
+
+    aleatorio = random.Random(semente)
+    nomes = hierarquia.nomes
+    pares = [(aleatorio.choice(nomes), aleatorio.choice(nomes)) for _ in range(consultas)]
+
+    inicio = time.perf_counter()
+    esperados = []
+    for origem, destino in pares:
+        distancias, _ = grafo.dijkstra(origem)
+        esperados.append(distancias[destino])
+    tempo_dijkstra = (time.perf_counter() - inicio) / consultas
+
+    inicio = time.perf_counter()
+    obtidos = [hierarquia.consultar(origem, destino)[0] for origem, destino in pares]
+    tempo_hierarquia = (time.perf_counter() - inicio) / consultas
+
+    divergencias = sum(1 for a, b in zip(esperados, obtidos) if a != b)
+
+    print(f"{lado * lado:>9} nós | grafo {tempo_grafo:7.2f} s | pré-processamento {tempo_construcao:8.2f} s "
+          f"| {len(hierarquia.destinos):>9} arestas de subida | dijkstra {tempo_dijkstra * 1e3:9.3f} ms "
+          f"| hierarquia {tempo_hierarquia * 1e3:7.3f} ms | {tempo_dijkstra / tempo_hierarquia:7.1f}x "
+          f"| divergências {divergencias}")
+    return divergencias
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compara Grafo.dijkstra com consultas na hierarquia de contração em grades sintéticas.")
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+                        help="número aproximado de nós de cada grade (padrão: 10k, 100k e 1M)")
+    parser.add_argument('--consultas', type=int, default=20,
+                        help="pares origem/destino sorteados por grade")
+    parser.add_argument('--semente', type=int, default=0)
+    args = parser.parse_args()
+
+    # O pré-processamento é Python puro: a grade de 1M de nós leva dezenas
+    # de minutos para contrair, mas só precisa ser feito uma vez.
+    divergencias = 0
+    for tamanho in args.tamanhos:
+        divergencias += medir(tamanho, args.consultas, args.semente)
+    if divergencias:
+        raise SystemExit(f"{divergencias} consultas divergiram do Dijkstra")
+
+
+if __name__ == '__main__':
+    main()
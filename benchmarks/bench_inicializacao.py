@@ -0,0 +1,77 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.geradores import gerar_grade
+
+
+# Cada medida é um processo Python novo, do início até o console de despacho
+# estar pronto para uso (janela montada e processada uma vez). Sem display,
+# mede-se o mesmo caminho até antes de criar a janela.
+FILHO = """
+import json, sys
+import main
+grafo = main.carregar_grafo(sys.argv[1] or None)
+hospitais = json.loads(sys.argv[2])
+janela = False
+try:
+    import tkinter as tk
+    root = tk.Tk()
+except tk.TclError:
+    root = None
+if root is not None:
+    main.Aplicacao(root, grafo, hospitais)
+    root.update()
+    janela = True
+pesados = [m for m in ('matplotlib', 'numpy', 'networkx') if m in sys.modules]
+print(json.dumps({'janela': janela, 'pesados': pesados}), flush=True)
+"""
+
+# O que o console importava na abertura antes de adiar a visualização.
+ANTIGO = "import matplotlib.pyplot, matplotlib.animation, matplotlib.patches\ntry:\n    import networkx\nexcept ImportError:\n    pass\n"
+
+
+def medir(codigo, *argumentos, repeticoes=5):
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        saida = subprocess.run([sys.executable, '-c', codigo, *argumentos], cwd=raiz,
+                               capture_output=True, text=True, check=True).stdout
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos), saida
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede o tempo de abertura do console de despacho (main.py).")
+    parser.add_argument('--lado', type=int, default=100, help="grade lado x lado para o grafo pré-compilado")
+    parser.add_argument('--repeticoes', type=int, default=5)
+    args = parser.parse_args()
+
+    base, _ = medir("pass", repeticoes=args.repeticoes)
+    print(f"interpretador vazio: {base * 1e3:.0f} ms")
+    antigo, _ = medir(ANTIGO, repeticoes=args.repeticoes)
+    print(f"só os imports de visualização (antes feitos na abertura): {antigo * 1e3:.0f} ms")
+
+    with tempfile.TemporaryDirectory() as pasta:
+        arquivo = os.path.join(pasta, 'grade.grafo')
+        gerar_grade(args.lado).salvar(arquivo)
+        casos = [
+            ("Maricá construído", '', ['Hospital Conde Modesto Leal', 'UPA de Inoã']),
+            (f"grade {args.lado}x{args.lado} de .grafo", arquivo, ['0,0']),
+        ]
+        for nome, caminho, hospitais in casos:
+            tempo, saida = medir(FILHO, caminho, json.dumps(hospitais), repeticoes=args.repeticoes)
+            resultado = json.loads(saida)
+            janela = "com janela" if resultado['janela'] else "sem display, sem janela"
+            pesados = ', '.join(resultado['pesados']) or "nenhum"
+            print(f"{nome}: {tempo * 1e3:.0f} ms até pronto ({janela}); módulos pesados carregados: {pesados}")
+
+
+if __name__ == '__main__':
+    main()
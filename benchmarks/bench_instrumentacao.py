@@ -0,0 +1,60 @@
+import argparse
+import random
+import time
+
+import instrumentacao
+from benchmarks.geradores import gerar_grade
+
+
+def medir(grafo, origens, pares):
+    # Pelas entradas públicas (que abrem as etapas), com os caches
+    # esvaziados a cada chamada para que toda consulta faça a busca.
+    inicio = time.perf_counter()
+    for origem in origens:
+        grafo.cache_arvores.limpar()
+        grafo.dijkstra(origem)
+    dijkstra = (time.perf_counter() - inicio) / len(origens)
+    inicio = time.perf_counter()
+    for origem, destino in pares:
+        grafo.cache_rotas.limpar()
+        grafo.menor_caminho(origem, destino)
+    rota = (time.perf_counter() - inicio) / len(pares)
+    return dijkstra, rota
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Custo da instrumentação nas buscas, desligada e ligada.")
+    parser.add_argument('--lado', type=int, default=200, help="grade lado x lado")
+    parser.add_argument('--buscas', type=int, default=5)
+    parser.add_argument('--rotas', type=int, default=200)
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('-o', '--saida', help="grava o relatório da rodada ligada (.json ou .pstats)")
+    args = parser.parse_args()
+
+    aleatorio = random.Random(args.semente)
+    grafo = gerar_grade(args.lado, args.semente)
+    nomes = list(grafo.adjacencias)
+    origens = [aleatorio.choice(nomes) for _ in range(args.buscas)]
+    pares = [(aleatorio.choice(nomes), aleatorio.choice(nomes)) for _ in range(args.rotas)]
+
+    instrumentacao.desativar()
+    desligada = medir(grafo, origens, pares)
+    instrumentacao.zerar()
+    instrumentacao.ativar()
+    ligada = medir(grafo, origens, pares)
+    instrumentacao.desativar()
+
+    for nome, sem, com in zip(("dijkstra", "menor_caminho"), desligada, ligada):
+        print(f"{nome}: {sem * 1e3:.2f} ms desligada, {com * 1e3:.2f} ms ligada ({com / sem - 1:+.1%})")
+    relatorio = instrumentacao.relatorio()
+    for nome, etapa in relatorio['etapas'].items():
+        print(f"  {nome}: {etapa['chamadas']} chamadas, média {etapa['media_ms']:.2f} ms")
+    for nome, valor in relatorio['contadores'].items():
+        print(f"  {nome}: {valor}")
+    if args.saida:
+        instrumentacao.exportar(args.saida)
+
+
+if __name__ == '__main__':
+    main()
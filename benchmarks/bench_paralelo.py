@@ -0,0 +1,42 @@
+import argparse
+import random
+import time
+
+from benchmarks.geradores import gerar_grade
+from paralelo import ExecutorParalelo
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compara consultas ponto a ponto em série e em vários processos com o grafo compartilhado.")
+    parser.add_argument('--lado', type=int, default=300, help="grade lado x lado")
+    parser.add_argument('--consultas', type=int, default=2000)
+    parser.add_argument('--trabalhadores', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--lote', type=int, default=64, help="consultas por tarefa enviada a um processo")
+    parser.add_argument('--semente', type=int, default=0)
+    args = parser.parse_args()
+
+    aleatorio = random.Random(args.semente)
+    grafo = gerar_grade(args.lado, args.semente)
+    nomes = list(grafo.adjacencias)
+    pares = [tuple(aleatorio.sample(nomes, 2)) for _ in range(args.consultas)]
+
+    inicio = time.perf_counter()
+    esperado = [grafo.menor_caminho(origem, destino) for origem, destino in pares]
+    serie = time.perf_counter() - inicio
+    print(f"{len(nomes)} nós, {args.consultas} consultas; em série: {serie:.2f} s "
+          f"({args.consultas / serie:,.0f} consultas/s)")
+
+    for trabalhadores in args.trabalhadores:
+        inicio = time.perf_counter()
+        with ExecutorParalelo(grafo, trabalhadores, tamanho_lote=args.lote) as executor:
+            obtido = list(executor.menores_caminhos(pares))
+        tempo = time.perf_counter() - inicio
+        if obtido != esperado:
+            raise SystemExit(f"{trabalhadores} processos: resultados divergem da execução em série")
+        print(f"{trabalhadores:>3} processos: {tempo:.2f} s ({args.consultas / tempo:,.0f} consultas/s, "
+              f"{serie / tempo:.2f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+import argparse
+import random
+import time
+
+from benchmarks.geradores import gerar_grade
+
+
+# Perfis típicos de um dia útil: picos da manhã e da tarde, e uma via que
+# fica mais lenta durante o dia todo.
+PERFIS = [
+    ([420, 480, 570, 1020, 1080, 1170], [1.0, 2.5, 1.0, 1.0, 2.2, 1.0]),
+    ([360, 720, 1320], [1.0, 1.4, 1.0]),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compara o Dijkstra dependente do horário com o de pesos fixos.")
+    parser.add_argument('--lado', type=int, default=200, help="grade lado x lado")
+    parser.add_argument('--fracoes', type=float, nargs='+', default=[0.2, 1.0],
+                        help="fração das ruas com perfil de horário")
+    parser.add_argument('--buscas', type=int, default=5)
+    parser.add_argument('--partida', type=float, default=480, help="minutos desde a meia-noite")
+    parser.add_argument('--semente', type=int, default=0)
+    args = parser.parse_args()
+
+    aleatorio = random.Random(args.semente)
+    grafo = gerar_grade(args.lado, args.semente)
+    nomes = list(grafo.adjacencias)
+    origens = [aleatorio.choice(nomes) for _ in range(args.buscas)]
+    ruas = [(origem, destino) for origem in nomes for destino, _ in grafo.adjacencias[origem] if origem < destino]
+
+    inicio = time.perf_counter()
+    for origem in origens:
+        grafo._dijkstra_compacto(origem)
+    fixo = (time.perf_counter() - inicio) / len(origens)
+    print(f"{len(nomes)} nós; Dijkstra com pesos fixos: {fixo * 1e3:.0f} ms")
+
+    aleatorio.shuffle(ruas)
+    com_perfil = 0
+    for fracao in sorted(args.fracoes):
+        for origem, destino in ruas[com_perfil:int(fracao * len(ruas))]:
+            grafo.definir_perfil(origem, destino, *aleatorio.choice(PERFIS))
+        com_perfil = max(com_perfil, int(fracao * len(ruas)))
+
+        inicio = time.perf_counter()
+        for origem in origens:
+            grafo.dijkstra_dependente(origem, args.partida)
+        dependente = (time.perf_counter() - inicio) / len(origens)
+        print(f"{fracao:4.0%} das ruas com perfil: {dependente * 1e3:.0f} ms ({dependente / fixo:.2f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+import argparse
+import random
+import time
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from benchmarks.geradores import gerar_grade
+from visualizacao import MapaEstatico, RastreamentoFrota
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Mede o quadro do mapa de acompanhamento da frota (posições + blitting) por número de ambulâncias.")
+    parser.add_argument('--lado', type=int, default=100, help="grade lado x lado")
+    parser.add_argument('--ambulancias', type=int, nargs='+', default=[10, 200, 1000])
+    parser.add_argument('--quadros', type=int, default=100)
+    parser.add_argument('--semente', type=int, default=0)
+    args = parser.parse_args()
+
+    aleatorio = random.Random(args.semente)
+    grafo = gerar_grade(args.lado, args.semente)
+    nomes = list(grafo.adjacencias)
+    figura = Figure(figsize=(10, 8))
+    FigureCanvasAgg(figura)
+    mapa = MapaEstatico(grafo, [nomes[0]], imagem=None, figura=figura)
+    frota = RastreamentoFrota(mapa)
+    frota.desenhar(0)
+
+    for quantidade in sorted(args.ambulancias):
+        while len(frota.viagens) < quantidade:
+            _, caminho = grafo.menor_caminho(aleatorio.choice(nomes), aleatorio.choice(nomes))
+            frota.adicionar(caminho, partida=0)
+        frota.desenhar(0)
+
+        inicio = time.perf_counter()
+        for quadro in range(args.quadros):
+            frota.desenhar(quadro * 0.5)
+        por_quadro = (time.perf_counter() - inicio) / args.quadros
+        print(f"{quantidade} ambulâncias: {por_quadro * 1e3:.1f} ms por quadro ({1 / por_quadro:.0f} quadros/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from benchmarks.geradores import gerar_grade
+from servico import ServicoRotas, servir_socket
+
+
+# Cliente de carga para o servico.py: abre várias conexões, dispara todos os
+# pedidos de uma vez (cada conexão manda os seus sem esperar respostas) e mede
+# a latência de cada um, do envio até a resposta com o mesmo id. Sem --porta,
+# sobe o serviço neste mesmo processo sobre uma grade sintética.
+
+
+async def disparar(host, porta, pedidos, conexoes):
+    latencias = []
+
+    async def cliente(parte):
+        leitor, escritor = await asyncio.open_connection(host, porta, limit=2 ** 20)
+        enviados = {}
+        for pedido in parte:
+            enviados[pedido['id']] = time.perf_counter()
+            escritor.write((json.dumps(pedido, ensure_ascii=False) + '\n').encode('utf-8'))
+        await escritor.drain()
+
+        erros = 0
+        for _ in parte:
+            resposta = json.loads(await leitor.readline())
+            latencias.append(time.perf_counter() - enviados.pop(resposta['id']))
+            erros += 'erro' in resposta
+        escritor.close()
+        return erros
+
+    inicio = time.perf_counter()
+    erros = await asyncio.gather(*(cliente(pedidos[i::conexoes]) for i in range(conexoes)))
+    return time.perf_counter() - inicio, sorted(latencias), sum(erros)
+
+
+async def executar(args):
+    aleatorio = random.Random(args.semente)
+    nomes = None
+    servidor = None
+    host, porta = args.host, args.porta
+
+    if porta is None:
+        grafo = gerar_grade(args.lado, args.semente)
+        nomes = list(grafo.adjacencias)
+        servico = ServicoRotas(grafo)
+        pronto = asyncio.get_running_loop().create_future()
+        servidor = asyncio.create_task(servir_socket(servico, host, 0, pronto.set_result))
+        porta = await pronto
+    else:
+        nomes = [linha.strip() for linha in open(args.locais, encoding='utf-8') if linha.strip()]
+
+    hospitais = aleatorio.sample(nomes, args.hospitais)
+    pedidos = [{'id': i, 'hospital': aleatorio.choice(hospitais), 'ocorrencia': aleatorio.choice(nomes)}
+               for i in range(args.pedidos)]
+
+    segundos, latencias, erros = await disparar(host, porta, pedidos, args.conexoes)
+
+    def percentil(p):
+        return latencias[min(len(latencias) - 1, int(p / 100 * len(latencias)))] * 1e3
+
+    print(f"{len(pedidos)} pedidos em {args.conexoes} conexões: {segundos:.2f} s "
+          f"({len(pedidos) / segundos:,.0f} pedidos/s), {erros} com erro")
+    print(f"latência: p50 {percentil(50):.1f} ms, p90 {percentil(90):.1f} ms, "
+          f"p99 {percentil(99):.1f} ms, máx {latencias[-1] * 1e3:.1f} ms")
+
+    if servidor is not None:
+        estatisticas = servico.estatisticas()
+        print(f"serviço: {estatisticas['buscas']} buscas, {estatisticas['agrupados']} pedidos agrupados")
+        servidor.cancel()
+        servico.fechar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Carga concorrente sobre o serviço de rotas, com p99 de latência.")
+    parser.add_argument('--pedidos', type=int, default=5000)
+    parser.add_argument('--conexoes', type=int, default=50)
+    parser.add_argument('--hospitais', type=int, default=8, help="origens distintas entre os pedidos")
+    parser.add_argument('--lado', type=int, default=100, help="grade lado x lado do serviço embutido")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, help="usa um servico.py já rodando nesta porta")
+    parser.add_argument('--locais', help="com --porta: arquivo com um nome de local por linha")
+    parser.add_argument('--semente', type=int, default=0)
+    args = parser.parse_args()
+    if args.porta is not None and not args.locais:
+        parser.error("--porta exige --locais")
+    asyncio.run(executar(args))
+
+
+if __name__ == '__main__':
+    main()
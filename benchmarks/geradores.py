@@ -0,0 +1,104 @@
+import math
+import random
+
+from grafo import Grafo
+from importador import ConstrutorCSR
+
+
+def gerar_grade(lado, semente=0, peso_minimo=1, peso_maximo=10):
+    # Malha lado x lado de ruas de mão dupla, com tempos inteiros aleatórios
+    # como os de peso_aleatorio() em main.py. Os nós ficam nas coordenadas
+    # (coluna, linha) e os tempos nunca são menores que a distância entre
+    # eles, então a heurística do A* também funciona aqui.
+    aleatorio = random.Random(semente)
+    grafo = Grafo()
+    for linha in range(lado):
+        for coluna in range(lado):
+            grafo.adicionar_vertice(f'{coluna},{linha}', (coluna, linha))
+
+    for linha in range(lado):
+        for coluna in range(lado):
+            if coluna + 1 < lado:
+                grafo.adicionar_aresta(f'{coluna},{linha}', f'{coluna + 1},{linha}',
+                                       aleatorio.randint(peso_minimo, peso_maximo))
+            if linha + 1 < lado:
+                grafo.adicionar_aresta(f'{coluna},{linha}', f'{coluna},{linha + 1}',
+                                       aleatorio.randint(peso_minimo, peso_maximo))
+
+    return grafo.compilar()
+
+
+# Os geradores abaixo montam o CSR direto pelo ConstrutorCSR, sem passar
+# pelas listas de adjacência do Grafo, para chegar a milhões de ruas. Os
+# locais têm coordenadas e o tempo de cada rua é o comprimento vezes um
+# fator sorteado entre 1 e 3, arredondado para cima: nunca menos que o
+# comprimento, como na grade.
+
+def _tempo(aleatorio, comprimento):
+    return max(1, math.ceil(comprimento * aleatorio.uniform(1, 3)))
+
+
+def gerar_geometrico(nos, semente=0, grau=8):
+    # Grafo geométrico aleatório: locais sorteados num quadrado de área
+    # `nos`, ligados a todos os outros a menos de um raio escolhido para dar
+    # `grau` vizinhos em média. Parecido com uma malha urbana irregular; com
+    # grau 8 quase todos os locais ficam no mesmo componente.
+    aleatorio = random.Random(semente)
+    lado = math.sqrt(nos)
+    raio = math.sqrt(grau / math.pi)
+    pontos = [(aleatorio.uniform(0, lado), aleatorio.uniform(0, lado)) for _ in range(nos)]
+
+    construtor = ConstrutorCSR()
+    celulas = {}
+    for i, (x, y) in enumerate(pontos):
+        construtor.vertice(str(i), (x, y))
+        celulas.setdefault((int(x // raio), int(y // raio)), []).append(i)
+
+    for (cx, cy), membros in celulas.items():
+        vizinhas = [celulas.get((cx + dx, cy + dy), ()) for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
+        for i in membros:
+            x, y = pontos[i]
+            for celula in vizinhas:
+                for j in celula:
+                    if j <= i:
+                        continue
+                    comprimento = math.hypot(pontos[j][0] - x, pontos[j][1] - y)
+                    if comprimento < raio:
+                        construtor.aresta(str(i), str(j), _tempo(aleatorio, comprimento))
+    return construtor.grafo()
+
+
+def gerar_livre_de_escala(nos, semente=0, ligacoes=2):
+    # Crescimento com ligação preferencial (Barabási-Albert): cada local novo
+    # liga-se a `ligacoes` locais já existentes, sorteados com probabilidade
+    # proporcional ao número de ruas que já têm, e nasce perto do primeiro
+    # deles. Surgem poucos cruzamentos muito conectados, como os das
+    # avenidas principais, cercados de ruas curtas, e o grafo é sempre
+    # conexo.
+    aleatorio = random.Random(semente)
+    construtor = ConstrutorCSR()
+    pontos = []
+    # Cada local aparece aqui uma vez por rua: sortear desta lista é sortear
+    # proporcionalmente ao grau.
+    extremidades = []
+    for i in range(nos):
+        if i <= ligacoes:
+            escolhidos = list(range(i))
+        else:
+            escolhidos = []
+            while len(escolhidos) < ligacoes:
+                j = aleatorio.choice(extremidades)
+                if j not in escolhidos:
+                    escolhidos.append(j)
+        if escolhidos:
+            x, y = pontos[escolhidos[0]]
+            posicao = (x + aleatorio.gauss(0, 1), y + aleatorio.gauss(0, 1))
+        else:
+            posicao = (0.0, 0.0)
+        pontos.append(posicao)
+        construtor.vertice(str(i), posicao)
+        for j in escolhidos:
+            construtor.aresta(str(i), str(j), _tempo(aleatorio, math.dist(posicao, pontos[j])))
+            extremidades.append(i)
+            extremidades.append(j)
+    return construtor.grafo()
@@ -0,0 +1,295 @@
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import random
+import sys
+import time
+
+from benchmarks.geradores import gerar_geometrico, gerar_grade, gerar_livre_de_escala
+
+
+# Suíte de desempenho reprodutível: para cada família de grafo sintético e
+# cada tamanho (em arestas do CSR, cada rua contando nos dois sentidos),
+# mede a construção, o Dijkstra completo, a busca do hospital mais próximo,
+# a reconstrução de caminhos e o desenho do mapa, e compara com uma
+# referência gravada. Tudo sai de sementes fixas, então duas rodadas medem
+# exatamente o mesmo trabalho; a verificação (soma das distâncias etc.)
+# confirma isso e também pega mudanças de resultado.
+#
+# Cada etapa é cronometrada sobre um lote fixo de chamadas (as mesmas em
+# toda rodada com a mesma semente), e o tempo registrado é o do lote
+# inteiro: nos grafos pequenos uma chamada leva microssegundos, e só o
+# lote fica bem acima do ruído da máquina. Cada lote é repetido e vale a
+# menor média entre as repetições, que é a medida menos sensível a
+# interferências; a razão entre a maior e a menor (a dispersão) mostra
+# quanto a máquina variou e alarga, até DISPERSAO_MAXIMA, a tolerância
+# daquela etapa na comparação. Com --rodadas, a suíte inteira é
+# repetida e a dispersão passa a incluir a variação entre as rodadas, que
+# numa máquina virtual pode durar minutos. Os tempos só são
+# comparáveis na mesma máquina: a referência de outra deve ser regravada
+# (--salvar) antes da mudança que se quer medir.
+
+REFERENCIA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'referencia.json')
+
+# Arestas do CSR por nó em cada família, para chegar ao tamanho pedido.
+FAMILIAS = {
+    'grade': (lambda arestas, semente: gerar_grade(max(2, round(math.sqrt(arestas / 4))), semente)),
+    'geometrico': (lambda arestas, semente: gerar_geometrico(max(2, arestas // 8), semente)),
+    'livre_de_escala': (lambda arestas, semente: gerar_livre_de_escala(max(3, arestas // 4), semente)),
+}
+
+# Segundos mínimos de cada repetição de uma etapa, e de carga antes da
+# primeira medida (processadores ociosos levam um tempo para acelerar).
+DURACAO_MINIMA = 0.1
+AQUECIMENTO = 2.0
+QUADROS_AMOSTRA = 20
+
+# Arestas percorridas, aproximadamente, por lote de Dijkstra ou de busca de
+# hospital: em grafos pequenos o lote repete mais origens (e mais
+# construções). Os caminhos reconstruídos por lote são fixos.
+LOTE_ARESTAS = 400_000
+LOTE_CAMINHOS = 10_000
+
+# Diferença absoluta (s) no tempo de um lote abaixo da qual a etapa nunca
+# conta como regressão, e maior dispersão que alarga a tolerância.
+RUIDO_MINIMO = 1e-3
+DISPERSAO_MAXIMA = 2.0
+
+ETAPAS = ('construcao', 'dijkstra', 'hospital_mais_proximo', 'reconstrucao', 'mapa', 'quadro')
+
+
+def _medir(funcao, lote):
+    # Tempo médio do lote inteiro (uma chamada por argumento). O lote é
+    # percorrido quantas vezes for preciso para durar ao menos
+    # DURACAO_MINIMA.
+    passadas = 0
+    inicio = time.perf_counter()
+    while True:
+        for argumento in lote:
+            funcao(argumento)
+        passadas += 1
+        decorrido = time.perf_counter() - inicio
+        if decorrido >= DURACAO_MINIMA:
+            return decorrido / passadas
+
+
+def _cronometrar(funcao, lote, repeticoes):
+    # Tempo do lote em cada repetição. Como no timeit, o coletor de lixo
+    # fica desligado durante a medida.
+    gc.collect()
+    gc.disable()
+    try:
+        return [_medir(funcao, lote) for _ in range(repeticoes)]
+    finally:
+        gc.enable()
+
+
+def _numero(valor):
+    return valor if valor != float('inf') else None
+
+
+def medir_renderizacao(grafo, hospitais, caminho, repeticoes):
+    # Montagem do mapa estático e primeiro desenho completo, numa figura Agg
+    # sem janela, e um quadro da animação por blitting.
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    from visualizacao import AnimacaoRota, MapaEstatico
+
+    def mapa(_):
+        figura = Figure(figsize=(10, 8))
+        FigureCanvasAgg(figura)
+        resultado = MapaEstatico(grafo, hospitais, imagem=None, figura=figura)
+        figura.canvas.draw()
+        return resultado
+
+    medidas_mapa = _cronometrar(mapa, [None], repeticoes)
+    animacao = AnimacaoRota(mapa(None), hospitais[0], caminho, 0)
+    animacao.desenhar_quadro(0)
+    # Até QUADROS_AMOSTRA quadros espalhados pelo caminho; cada um custa
+    # mais em caminhos longos (o texto do caminho restante).
+    quadros = list(range(0, animacao.quadros, max(1, animacao.quadros // QUADROS_AMOSTRA)))
+    return medidas_mapa, _cronometrar(animacao.desenhar_quadro, quadros, repeticoes)
+
+
+def medir(familia, arestas, semente=0, consultas=5, repeticoes=5, renderizar=True):
+    # O último grafo construído é o usado nas outras etapas. A construção
+    # de um grafo pequeno também é curta demais sozinha, e entra num lote.
+    construidos = []
+
+    def construir(_):
+        construidos[:] = [FAMILIAS[familia](arestas, semente)]
+
+    vezes = max(1, LOTE_ARESTAS // arestas)
+    medidas = {'construcao': _cronometrar(construir, [None] * max(1, vezes // 10), repeticoes)}
+    grafo = construidos.pop()
+    compacto = grafo.como_compacto()
+
+    aleatorio = random.Random(semente)
+    nomes = compacto.nomes
+    origens = [aleatorio.choice(nomes) for _ in range(consultas)]
+    hospitais = aleatorio.sample(nomes, min(10, len(nomes)))
+    destinos = [aleatorio.choice(nomes) for _ in range(100)]
+    # As primeiras origens do lote são as `consultas` sorteadas acima.
+    lote = origens + [aleatorio.choice(nomes) for _ in range(vezes - consultas)]
+
+    def dijkstra(origem):
+        grafo.cache_arvores.limpar()
+        return grafo.dijkstra(origem)
+
+    medidas['dijkstra'] = _cronometrar(dijkstra, lote, repeticoes)
+    medidas['hospital_mais_proximo'] = _cronometrar(
+        lambda origem: grafo.encontrar_hospital_mais_proximo(origem, hospitais), lote, repeticoes)
+    distancias, anteriores = dijkstra(origens[0])
+    alcancaveis = [destino for destino in destinos if distancias[destino] != float('inf')] or [origens[0]]
+    caminhos_lote = [alcancaveis[i % len(alcancaveis)] for i in range(LOTE_CAMINHOS)]
+    medidas['reconstrucao'] = _cronometrar(
+        lambda destino: grafo.reconstruir_caminho(anteriores, destino), caminhos_lote, repeticoes)
+
+    # Resultados que duas rodadas com a mesma semente têm de repetir.
+    finitas = [valor for valor in distancias.values() if valor != float('inf')]
+    mais_proximos = [grafo.encontrar_hospital_mais_proximo(origem, hospitais)[1] for origem in origens]
+    caminhos = [grafo.reconstruir_caminho(anteriores, destino) for destino in alcancaveis]
+    verificacao = {
+        'nos': len(compacto),
+        'arestas': len(compacto.destinos),
+        'alcancaveis': len(finitas),
+        'soma_distancias': sum(finitas),
+        'hospital_mais_proximo': [_numero(valor) for valor in mais_proximos],
+        'nos_nos_caminhos': sum(len(caminho) for caminho in caminhos),
+    }
+
+    if renderizar:
+        caminho = max(caminhos, key=len)
+        medidas['mapa'], medidas['quadro'] = medir_renderizacao(grafo, hospitais, caminho, repeticoes)
+    return {'tempos': {etapa: min(tempos) for etapa, tempos in medidas.items()},
+            'dispersao': {etapa: max(tempos) / min(tempos) for etapa, tempos in medidas.items()},
+            'verificacao': verificacao}
+
+
+def combinar(acumulado, rodada):
+    # Junta uma nova rodada do mesmo caso: vale o menor tempo de cada etapa,
+    # e a dispersão vai da repetição mais rápida à mais lenta de todas elas.
+    tempos, dispersao = {}, {}
+    for etapa, tempo in rodada['tempos'].items():
+        menor = min(tempo, acumulado['tempos'][etapa])
+        maior = max(tempo * rodada['dispersao'][etapa],
+                    acumulado['tempos'][etapa] * acumulado['dispersao'][etapa])
+        tempos[etapa], dispersao[etapa] = menor, maior / menor
+    return {'tempos': tempos, 'dispersao': dispersao, 'verificacao': rodada['verificacao']}
+
+
+def maquina_atual():
+    return {'python': platform.python_version(), 'plataforma': platform.platform(),
+            'processador': platform.processor() or platform.machine(), 'nucleos': os.cpu_count()}
+
+
+def comparar(atual, referencia, tolerancia, ruido=RUIDO_MINIMO):
+    # Devolve as linhas do relatório e quantos problemas houve: etapas mais
+    # lentas que a referência além da tolerância (e por mais de `ruido`
+    # segundos no lote), ou resultados diferentes. A tolerância de cada
+    # etapa é multiplicada pela maior dispersão entre a rodada e a
+    # referência, limitada a DISPERSAO_MAXIMA.
+    linhas, problemas = [], 0
+    for caso, resultado in atual.items():
+        anterior = referencia.get(caso)
+        if anterior is None:
+            linhas.append(f"{caso}: sem referência")
+            continue
+        if resultado['verificacao'] != anterior['verificacao']:
+            problemas += 1
+            linhas.append(f"{caso}: RESULTADO DIFERENTE da referência")
+        for etapa, tempo in resultado['tempos'].items():
+            tempo_referencia = anterior['tempos'].get(etapa)
+            if not tempo_referencia:
+                continue
+            razao = tempo / tempo_referencia
+            dispersao = min(DISPERSAO_MAXIMA, max(resultado.get('dispersao', {}).get(etapa, 1.0),
+                                                  anterior.get('dispersao', {}).get(etapa, 1.0)))
+            limite = (1 + tolerancia) * dispersao
+            if abs(tempo - tempo_referencia) < ruido:
+                situacao = "ok"
+            elif razao > limite:
+                problemas += 1
+                situacao = "REGRESSÃO"
+            elif razao < 1 / limite:
+                situacao = "melhora"
+            else:
+                situacao = "ok"
+            linhas.append(f"{caso} {etapa:>22}: {tempo_referencia * 1e3:10.3f} ms -> {tempo * 1e3:10.3f} ms "
+                          f"({razao:5.2f}x, limite {limite:4.2f}x) {situacao}")
+    return linhas, problemas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Suíte de desempenho em grafos sintéticos, comparada com uma referência gravada.")
+    parser.add_argument('--familias', nargs='+', choices=list(FAMILIAS), default=list(FAMILIAS))
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[1_000, 10_000, 100_000],
+                        help="arestas do CSR (cada rua conta duas vezes); até 5000000")
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--consultas', type=int, default=5,
+                        help="origens sorteadas por grafo (grafos pequenos usam mais, até LOTE_ARESTAS arestas)")
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--rodadas', type=int, default=1,
+                        help="repete a suíte inteira (recomendado ao gravar uma referência)")
+    parser.add_argument('--sem-renderizacao', action='store_true', help="não mede o desenho do mapa")
+    parser.add_argument('--referencia', default=REFERENCIA, help="resultados de referência (JSON)")
+    parser.add_argument('--tolerancia', type=float, default=0.3,
+                        help="fração mais lenta que a referência tolerada por etapa")
+    parser.add_argument('--ruido', type=float, default=RUIDO_MINIMO * 1e3,
+                        help="diferença em ms no tempo do lote ignorada em qualquer etapa")
+    parser.add_argument('--salvar', metavar='ARQUIVO', help="grava esta rodada (ex.: como nova referência)")
+    args = parser.parse_args(argv)
+
+    # Lida antes da rodada, para que --salvar sobre o próprio arquivo ainda
+    # compare com a referência anterior.
+    referencia = None
+    if args.referencia and os.path.exists(args.referencia):
+        with open(args.referencia, encoding='utf-8') as arquivo:
+            referencia = json.load(arquivo)
+
+    inicio = time.perf_counter()
+    while time.perf_counter() - inicio < AQUECIMENTO:
+        sorted(range(10000), key=lambda i: -i)
+
+    resultados = {}
+    for _ in range(args.rodadas):
+        for familia in args.familias:
+            for tamanho in args.tamanhos:
+                caso = f"{familia}/{tamanho}"
+                rodada = medir(familia, tamanho, args.semente, args.consultas, args.repeticoes,
+                               not args.sem_renderizacao)
+                resultados[caso] = combinar(resultados[caso], rodada) if caso in resultados else rodada
+                tempos = rodada['tempos']
+                verificacao = rodada['verificacao']
+                print(f"{caso:>24} | {verificacao['nos']:>8} nós {verificacao['arestas']:>8} arestas | "
+                      + " | ".join(f"{etapa} {tempos[etapa] * 1e3:.1f} ms" for etapa in ETAPAS if etapa in tempos),
+                      flush=True)
+
+    if args.salvar:
+        with open(args.salvar, 'w', encoding='utf-8') as arquivo:
+            json.dump({'maquina': maquina_atual(), 'semente': args.semente, 'consultas': args.consultas,
+                       'resultados': resultados}, arquivo, indent=1)
+        print(f"resultados gravados em {args.salvar}")
+
+    if referencia is None:
+        return
+    if (referencia.get('semente'), referencia.get('consultas')) != (args.semente, args.consultas):
+        print("referência gravada com outra semente ou número de consultas; comparação ignorada")
+        return
+    maquina = maquina_atual()
+    if referencia['maquina'] != maquina:
+        print(f"aviso: referência gravada em outra máquina ({referencia['maquina']}); "
+              "os tempos não são comparáveis", file=sys.stderr)
+    linhas, problemas = comparar(resultados, referencia['resultados'], args.tolerancia, args.ruido / 1e3)
+    print(f"\ncomparação com {args.referencia}:")
+    print("\n".join(linhas))
+    if problemas:
+        sys.exit(f"{problemas} regressões ou resultados diferentes da referência")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+import time
+from collections import OrderedDict
+
+
+class CacheRotas:
+    # Cache LRU de resultados de busca, com validade opcional (TTL, em
+    # segundos). Cada consulta informa a versão atual do grafo; se ela mudou
+    # desde que as entradas foram guardadas, o cache inteiro é descartado,
+    # então nunca se devolve uma rota calculada com pesos antigos.
+    #
+    # As estatísticas (acertos, falhas, despejos por capacidade, expirações
+    # e invalidações por versão) servem para dimensionar a capacidade.
+    def __init__(self, capacidade=128, validade=None, relogio=time.monotonic):
+        self.capacidade = capacidade
+        self.validade = validade
+        self._relogio = relogio
+        self._entradas = OrderedDict()
+        self._versao = None
+        self.zerar_estatisticas()
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def zerar_estatisticas(self):
+        self.acertos = 0
+        self.falhas = 0
+        self.despejos = 0
+        self.expiracoes = 0
+        self.invalidacoes = 0
+
+    def limpar(self):
+        self._entradas.clear()
+
+    def _sincronizar(self, versao):
+        if versao != self._versao:
+            if self._entradas:
+                self.invalidacoes += 1
+                self._entradas.clear()
+            self._versao = versao
+
+    def obter(self, chave, versao):
+        # Devolve o valor guardado ou None (falha).
+        self._sincronizar(versao)
+        entrada = self._entradas.get(chave)
+        if entrada is not None:
+            instante, valor = entrada
+            if self.validade is None or self._relogio() - instante <= self.validade:
+                self._entradas.move_to_end(chave)
+                self.acertos += 1
+                return valor
+            del self._entradas[chave]
+            self.expiracoes += 1
+        self.falhas += 1
+        return None
+
+    def guardar(self, chave, versao, valor):
+        if self.capacidade <= 0:
+            return
+        self._sincronizar(versao)
+        self._entradas[chave] = (self._relogio(), valor)
+        self._entradas.move_to_end(chave)
+        while len(self._entradas) > self.capacidade:
+            self._entradas.popitem(last=False)
+            self.despejos += 1
+
+    def estatisticas(self):
+        consultas = self.acertos + self.falhas
+        return {
+            'capacidade': self.capacidade,
+            'tamanho': len(self._entradas),
+            'acertos': self.acertos,
+            'falhas': self.falhas,
+            'taxa_acerto': self.acertos / consultas if consultas else 0.0,
+            'despejos': self.despejos,
+            'expiracoes': self.expiracoes,
+            'invalidacoes': self.invalidacoes,
+        }
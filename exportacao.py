@@ -0,0 +1,205 @@
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+import numpy as np
+from matplotlib import rcParams
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+import marica
+from motor import carregar_grafo, ler_resultados
+from visualizacao import EXTENSAO_MARICA, IMAGEM_MARICA, AnimacaoRota, MapaEstatico
+
+
+# Exportação das animações de despacho, sem janela, para vídeo (MP4), GIF ou
+# uma pasta de quadros PNG; serve para rever despachos já feitos (a saída do
+# motor.py). As figuras são Agg puras, sem pyplot. Cada processo desenha o
+# mapa estático uma vez e o reaproveita em todas as rotas: por quadro, só os
+# artistas da rota são desenhados sobre o fundo guardado.
+
+FORMATOS = ('mp4', 'gif', 'png')
+
+# Milissegundos por trecho do caminho, como na animação interativa.
+INTERVALO = 2100
+
+
+class ExportadorRotas:
+    def __init__(self, grafo, hospitais, imagem=IMAGEM_MARICA, extensao=EXTENSAO_MARICA, dpi=100):
+        figura = Figure(figsize=(10, 8), dpi=dpi)
+        FigureCanvasAgg(figura)
+        self.mapa = MapaEstatico(grafo, hospitais, imagem, extensao, figura=figura)
+        # Único desenho completo: depois dele o fundo fica guardado na camada.
+        figura.canvas.draw()
+
+    def quadros(self, ambulancia, caminho, tempo_total):
+        # Cada quadro como array RGBA (altura x largura x 4). O array é o
+        # próprio buffer da figura e só vale até o quadro seguinte.
+        animacao = AnimacaoRota(self.mapa, ambulancia, caminho, tempo_total)
+        try:
+            for quadro in range(animacao.quadros):
+                animacao.desenhar_quadro(quadro)
+                yield np.asarray(self.mapa.figura.canvas.buffer_rgba())
+        finally:
+            animacao.remover()
+
+    def exportar(self, ambulancia, caminho, tempo_total, saida, formato='mp4', intervalo=INTERVALO):
+        # Grava a animação em `saida` (um arquivo, ou uma pasta para 'png')
+        # e devolve o número de quadros.
+        if formato not in FORMATOS:
+            raise ValueError(f"Formato desconhecido: {formato} (use {', '.join(FORMATOS)}).")
+        gravar = {'mp4': _gravar_mp4, 'gif': _gravar_gif, 'png': _gravar_png}[formato]
+        return gravar(self.quadros(ambulancia, caminho, tempo_total), saida, intervalo)
+
+
+# Pillow já vem com o matplotlib. A compressão padrão do PNG custa três
+# vezes o desenho do quadro; o nível 1 gera arquivos pouco maiores.
+
+def _gravar_png(quadros, pasta, intervalo):
+    from PIL import Image
+    os.makedirs(pasta, exist_ok=True)
+    total = 0
+    for total, quadro in enumerate(quadros, 1):
+        Image.fromarray(quadro).save(os.path.join(pasta, f"quadro_{total:04d}.png"), compress_level=1)
+    return total
+
+
+def _gravar_gif(quadros, caminho, intervalo):
+    # Os quadros diferem do primeiro só pelos artistas da rota, então a
+    # paleta de 256 cores é calculada uma vez e reaproveitada, em vez de uma
+    # quantização completa por quadro.
+    from PIL import Image
+    imagens = []
+    for quadro in quadros:
+        imagem = Image.fromarray(quadro[..., :3])
+        if not imagens:
+            imagens.append(imagem.quantize(256, method=Image.Quantize.FASTOCTREE))
+        else:
+            imagens.append(imagem.quantize(palette=imagens[0], dither=Image.Dither.NONE))
+    if imagens:
+        imagens[0].save(caminho, save_all=True, append_images=imagens[1:], duration=intervalo)
+    return len(imagens)
+
+
+def _gravar_mp4(quadros, caminho, intervalo):
+    # Os quadros vão crus para o ffmpeg pela entrada padrão, sem arquivos
+    # intermediários. O executável é o mesmo que o matplotlib usaria.
+    ffmpeg = shutil.which(rcParams['animation.ffmpeg_path'])
+    if ffmpeg is None:
+        raise RuntimeError("ffmpeg não encontrado; instale-o ou exporte em gif/png.")
+    processo = None
+    total = 0
+    try:
+        for total, quadro in enumerate(quadros, 1):
+            if processo is None:
+                altura, largura = quadro.shape[:2]
+                processo = subprocess.Popen(
+                    [ffmpeg, '-y', '-loglevel', 'error',
+                     '-f', 'rawvideo', '-pix_fmt', 'rgba', '-s', f'{largura}x{altura}',
+                     '-framerate', f'{1000 / intervalo}', '-i', '-',
+                     # H.264 em yuv420p exige dimensões pares.
+                     '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2', '-pix_fmt', 'yuv420p',
+                     '-c:v', 'libx264', '-preset', 'veryfast', '-r', '25', caminho],
+                    stdin=subprocess.PIPE)
+            processo.stdin.write(quadro.tobytes())
+    finally:
+        if processo is not None:
+            processo.stdin.close()
+            processo.wait()
+    if processo is not None and processo.returncode != 0:
+        raise RuntimeError(f"ffmpeg terminou com código {processo.returncode} ao gravar {caminho}.")
+    return total
+
+
+# Exportadores já montados neste processo, por grafo e configuração do mapa.
+_exportadores = {}
+
+
+def _exportar_lote(grafo, tarefas):
+    # Roda em série ou nos trabalhadores do ExecutorParalelo. Cada tarefa é
+    # (configuração do mapa, registro do despacho, saída, formato, intervalo);
+    # devolve, por tarefa, (saída, quadros, segundos, erro).
+    resultados = []
+    for configuracao, registro, saida, formato, intervalo in tarefas:
+        inicio = time.perf_counter()
+        chave = (id(grafo), configuracao)
+        if chave not in _exportadores:
+            _exportadores[chave] = ExportadorRotas(grafo, *configuracao)
+        try:
+            quadros = _exportadores[chave].exportar(registro['hospital'], registro['caminho'],
+                                                    registro.get('tempo_total'), saida, formato, intervalo)
+            resultados.append((saida, quadros, time.perf_counter() - inicio, None))
+        except (KeyError, RuntimeError, OSError) as erro:
+            resultados.append((saida, 0, time.perf_counter() - inicio, f"{type(erro).__name__}: {erro}"))
+    return resultados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Exporta animações de despachos já calculados (saída do motor.py) para vídeo, GIF ou PNG.")
+    parser.add_argument('resultados', help="arquivo gravado pelo motor.py (.jsonl ou .csv); '-' para stdin")
+    parser.add_argument('-o', '--saida', required=True, help="pasta onde gravar as animações")
+    parser.add_argument('-g', '--grafo', help=f"grafo usado no despacho, como no motor.py; padrão: {marica.ARQUIVO_GRAFO}")
+    parser.add_argument('--formato', choices=FORMATOS, default='mp4')
+    parser.add_argument('--formato-resultados', choices=['csv', 'jsonl'])
+    parser.add_argument('--hospitais', nargs='+', help="locais destacados como hospitais no mapa")
+    parser.add_argument('--imagem', help="imagem de fundo; padrão: mapa de Maricá, sem fundo com -g")
+    parser.add_argument('--extensao', type=float, nargs=4, metavar=('X0', 'X1', 'Y0', 'Y1'),
+                        default=EXTENSAO_MARICA, help="coordenadas cobertas pela imagem de fundo")
+    parser.add_argument('--intervalo', type=int, default=INTERVALO, help="milissegundos por trecho")
+    parser.add_argument('--dpi', type=int, default=100)
+    parser.add_argument('-j', '--trabalhadores', type=int, default=1, metavar='N',
+                        help="processos que desenham rotas em paralelo")
+    args = parser.parse_args(argv)
+    if args.formato == 'mp4' and shutil.which(rcParams['animation.ffmpeg_path']) is None:
+        parser.error("ffmpeg não encontrado; instale-o ou use --formato gif/png.")
+    # Um Maricá montado na hora teria outros pesos sorteados, e os quadros
+    # mostrariam tempos diferentes dos que geraram os despachos.
+    if args.grafo is None and not os.path.exists(marica.ARQUIVO_GRAFO):
+        parser.error(f"sem -g, é preciso o {marica.ARQUIVO_GRAFO} usado no despacho (gere com python marica.py "
+                     "antes de rodar o motor.py)")
+
+    grafo = carregar_grafo(args.grafo)
+    hospitais = args.hospitais or (marica.hospitais if args.grafo is None else [])
+    imagem = args.imagem or (IMAGEM_MARICA if args.grafo is None else None)
+    configuracao = (tuple(hospitais), imagem, tuple(args.extensao), args.dpi)
+    os.makedirs(args.saida, exist_ok=True)
+    extensao = '' if args.formato == 'png' else f'.{args.formato}'
+
+    tarefas = (
+        (configuracao, registro, os.path.join(args.saida, f"{numero:06d}{extensao}"), args.formato, args.intervalo)
+        for numero, registro in enumerate(ler_resultados(args.resultados, args.formato_resultados), 1)
+        if registro.get('caminho'))
+
+    inicio = time.perf_counter()
+    if args.trabalhadores > 1:
+        from paralelo import ExecutorParalelo
+        executor = ExecutorParalelo(grafo, args.trabalhadores, tamanho_lote=1)
+        resultados = executor.mapear(_exportar_lote, tarefas)
+    else:
+        executor = None
+        resultados = (resultado for tarefa in tarefas for resultado in _exportar_lote(grafo, [tarefa]))
+
+    exportadas = falhas = quadros = 0
+    try:
+        for saida, quadros_rota, _, erro in resultados:
+            if erro:
+                falhas += 1
+                print(f"{saida}: {erro}", file=sys.stderr)
+            else:
+                exportadas += 1
+                quadros += quadros_rota
+    finally:
+        if executor is not None:
+            executor.fechar()
+
+    segundos = time.perf_counter() - inicio
+    print(f"{exportadas} rotas ({quadros} quadros) exportadas em {segundos:.1f} s"
+          + (f"; {falhas} com erro" if falhas else ""), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
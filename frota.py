@@ -0,0 +1,149 @@
+import math
+
+
+# Atribuição de várias ambulâncias a várias ocorrências de uma vez,
+# minimizando o tempo total de deslocamento. O custo de cada par é o menor
+# tempo no Grafo, e a atribuição ótima sai do método húngaro.
+
+# Custo usado para pares sem rota e para as vagas fictícias que aparecem
+# quando há mais ocorrências do que ambulâncias: grande o bastante para que
+# a solução só recorra a elas quando não houver alternativa.
+PENALIDADE = 1e9
+
+
+class Hungaro:
+    # Método húngaro na forma de caminhos mínimos aumentantes (O(n² m)),
+    # acrescentando uma linha (ocorrência) por vez às colunas (ambulâncias).
+    # Cada linha nova é uma única fase de aumento a partir dos potenciais
+    # atuais, então a solução continua ótima sem resolver tudo de novo.
+    # Exige linhas <= colunas.
+    def __init__(self, colunas):
+        self.colunas = colunas
+        self.custos = [None]  # linhas a partir de 1, como os potenciais
+        self._u = [0.0]
+        self._v = [0.0] * (colunas + 1)
+        # _linha_de[j]: linha atribuída à coluna j (0 = livre).
+        self._linha_de = [0] * (colunas + 1)
+
+    def __len__(self):
+        return len(self.custos) - 1
+
+    def adicionar_linha(self, custos):
+        if len(custos) != self.colunas:
+            raise ValueError(f"Esperados {self.colunas} custos, recebidos {len(custos)}.")
+        if len(self) == self.colunas:
+            raise ValueError("Há mais linhas do que colunas; acrescente colunas antes.")
+        self.custos.append([0.0, *custos])
+        self._u.append(0.0)
+        self._aumentar(len(self.custos) - 1)
+
+    def _aumentar(self, i):
+        m = self.colunas
+        custos, u, v, linha_de = self.custos, self._u, self._v, self._linha_de
+        infinito = math.inf
+        minimos = [infinito] * (m + 1)
+        anterior = [0] * (m + 1)
+        livres = list(range(1, m + 1))
+        usadas = [0]
+
+        linha_de[0] = i
+        j0 = 0
+        while True:
+            i0 = linha_de[j0]
+            linha, u0 = custos[i0], u[i0]
+            delta, j1 = infinito, 0
+            for j in livres:
+                atual = linha[j] - u0 - v[j]
+                if atual < minimos[j]:
+                    minimos[j] = atual
+                    anterior[j] = j0
+                if minimos[j] < delta:
+                    delta, j1 = minimos[j], j
+
+            for j in usadas:
+                u[linha_de[j]] += delta
+                v[j] -= delta
+            for j in livres:
+                minimos[j] -= delta
+
+            livres.remove(j1)
+            usadas.append(j1)
+            j0 = j1
+            if linha_de[j0] == 0:
+                break
+
+        while j0:
+            j1 = anterior[j0]
+            linha_de[j0] = linha_de[j1]
+            j0 = j1
+
+    def atribuicao(self):
+        # coluna atribuída a cada linha (índices a partir de 0).
+        coluna_de = [None] * len(self)
+        for j in range(1, self.colunas + 1):
+            if self._linha_de[j]:
+                coluna_de[self._linha_de[j] - 1] = j - 1
+        return coluna_de
+
+
+class DespachoFrota:
+    # Uso:
+    #     frota = DespachoFrota(grafo, ['Rua Abreu Rangel', 'UPA de Inoã'])
+    #     frota.adicionar_ocorrencia('Av. Roberto Silveira')
+    #     for ambulancia, ocorrencia, tempo in frota.atribuicoes(): ...
+    #
+    # Cada ocorrência nova custa uma busca no grafo (até alcançar todas as
+    # ambulâncias) e uma fase do método húngaro. `ambulancias` são os locais
+    # onde cada viatura está; podem repetir.
+    def __init__(self, grafo, ambulancias):
+        self.grafo = grafo
+        self.ambulancias = list(ambulancias)
+        self.ocorrencias = []
+        self._hungaro = Hungaro(len(self.ambulancias))
+
+    def custos(self, ocorrencia):
+        # Ruas de mão dupla: a busca parte da ocorrência e para quando chega
+        # a todas as ambulâncias.
+        distancias = self.grafo.distancias_ate(ocorrencia, set(self.ambulancias))
+        return [min(distancias[ambulancia], PENALIDADE) for ambulancia in self.ambulancias]
+
+    def adicionar_ocorrencia(self, local):
+        custos = self.custos(local)
+        if len(self._hungaro) == self._hungaro.colunas:
+            # Mais ocorrências do que ambulâncias: abre vagas fictícias
+            # ("aguardando") e resolve de novo com elas. Abre uma leva de uma
+            # vez, para não ter de resolver tudo a cada ocorrência excedente.
+            extras = len(self.ambulancias) or 1
+            self._resolver([linha[1:] + [PENALIDADE] * extras for linha in self._hungaro.custos[1:]],
+                           self._hungaro.colunas + extras)
+        custos += [PENALIDADE] * (self._hungaro.colunas - len(self.ambulancias))
+        self.ocorrencias.append(local)
+        self._hungaro.adicionar_linha(custos)
+
+    def adicionar_ocorrencias(self, locais):
+        for local in locais:
+            self.adicionar_ocorrencia(local)
+
+    def _resolver(self, linhas, colunas):
+        self._hungaro = Hungaro(colunas)
+        for linha in linhas:
+            self._hungaro.adicionar_linha(linha)
+
+    def matriz_custos(self):
+        # ocorrência x ambulância, em tempo de deslocamento.
+        return [linha[1:len(self.ambulancias) + 1] for linha in self._hungaro.custos[1:]]
+
+    def atribuicoes(self):
+        # (ambulância, ocorrência, tempo) para cada ocorrência; ambulância
+        # None quando ela fica aguardando (sem viatura livre ou sem rota).
+        resultado = []
+        for i, j in enumerate(self._hungaro.atribuicao()):
+            custo = self._hungaro.custos[i + 1][j + 1]
+            if j >= len(self.ambulancias) or custo >= PENALIDADE:
+                resultado.append((None, self.ocorrencias[i], math.inf))
+            else:
+                resultado.append((self.ambulancias[j], self.ocorrencias[i], custo))
+        return resultado
+
+    def tempo_total(self):
+        return sum(tempo for ambulancia, _, tempo in self.atribuicoes() if ambulancia is not None)
@@ -0,0 +1,1021 @@
+import heapq
+import math
+import mmap
+import os
+import struct
+import weakref
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping
+
+import instrumentacao
+from arvores import ArvoreCaminhos
+from cache_rotas import CacheRotas
+from indice_espacial import IndiceEspacial
+from perfis import PerfisHorario
+
+# Memória que o cache de árvores do grafo compilado pode ocupar; cada árvore
+# custa 16 bytes por nó, então grafos grandes guardam menos árvores.
+MEMORIA_CACHE_ARVORES = 64 * 2 ** 20
+
+
+class GrafoCompacto:
+    # Representação CSR (compressed sparse row) do grafo: os vizinhos do
+    # nó i ficam em destinos[inicios[i]:inicios[i + 1]], em ordem crescente
+    # de id (para achar uma aresta por busca binária), com os pesos
+    # correspondentes em pesos[...]. Os nós são inteiros; `nomes` e
+    # `indices` traduzem entre id e nome do local. As coordenadas, quando
+    # existem, ficam em xs/ys (NaN para nós sem posição), e os perfis de
+    # horário das ruas (PerfisHorario), quando definidos, em `perfis`.
+    def __init__(self, nomes, inicios, destinos, pesos, xs=None, ys=None, perfis=None):
+        self.nomes = nomes
+        self.indices = dict(zip(nomes, range(len(nomes))))
+        self.inicios = inicios
+        self.destinos = destinos
+        self.pesos = pesos
+        self.xs = xs
+        self.ys = ys
+        self.perfis = perfis
+
+    @classmethod
+    def de_adjacencias(cls, adjacencias, posicoes=None):
+        nomes = list(adjacencias)
+        indices = {nome: i for i, nome in enumerate(nomes)}
+
+        todos_inteiros = all(isinstance(peso, int)
+                             for vizinhos in adjacencias.values()
+                             for _, peso in vizinhos)
+
+        inicios = array('q', [0])
+        destinos = array('q')
+        pesos = array('q' if todos_inteiros else 'd')
+        for nome in nomes:
+            for vizinho, peso in sorted((indices[vizinho], peso) for vizinho, peso in adjacencias[nome]):
+                destinos.append(vizinho)
+                pesos.append(peso)
+            inicios.append(len(destinos))
+
+        xs = ys = None
+        if posicoes:
+            sem_posicao = (math.nan, math.nan)
+            xs = array('d', (posicoes.get(nome, sem_posicao)[0] for nome in nomes))
+            ys = array('d', (posicoes.get(nome, sem_posicao)[1] for nome in nomes))
+
+        return cls(nomes, inicios, destinos, pesos, xs, ys)
+
+    def __len__(self):
+        return len(self.nomes)
+
+    @property
+    def pesos_inteiros(self):
+        # Os arrays podem ser `array` ou `memoryview` (buffer compartilhado).
+        return getattr(self.pesos, 'typecode', None) == 'q' or getattr(self.pesos, 'format', None) == 'q'
+
+    # Formato binário: cabeçalho e depois os arrays, todos com itens de 8
+    # bytes, um após o outro: inicios, destinos, pesos, xs e ys (se houver
+    # coordenadas), os perfis de horário (se houver: quantidade de perfis,
+    # de pontos e período, depois perfil_de, inicios, instantes e fatores do
+    # PerfisHorario) e por fim os nomes em UTF-8 separados por '\0'. Pode ser
+    # escrito em qualquer buffer gravável (bytearray, memória compartilhada,
+    # mmap) e lido de volta sem copiar os arrays. Arquivos de versões
+    # anteriores, sem o bit 8 (linhas ordenadas), têm as linhas ordenadas ao
+    # abrir, numa cópia.
+    _CABECALHO = struct.Struct('<8sqqqq')
+    _ASSINATURA = b'GRAFOCSR'
+
+    def _nomes_codificados(self):
+        for nome in self.nomes:
+            if not isinstance(nome, str) or '\0' in nome:
+                raise ValueError(f"Nome de local não serializável: {nome!r}")
+        return '\0'.join(self.nomes).encode('utf-8')
+
+    def _arrays_perfis(self):
+        p = self.perfis
+        if p is None:
+            return []
+        contagens = array('q', [len(p.inicios) - 1, len(p.instantes), p.periodo])
+        return [contagens, p.perfil_de, p.inicios, p.instantes, p.fatores]
+
+    def tamanho_binario(self, nomes_codificados=None):
+        if nomes_codificados is None:
+            nomes_codificados = self._nomes_codificados()
+        n, m = len(self.nomes), len(self.destinos)
+        coordenadas = 2 * n if self.xs is not None else 0
+        perfis = sum(len(valores) for valores in self._arrays_perfis())
+        return self._CABECALHO.size + 8 * ((n + 1) + 2 * m + coordenadas + perfis) + len(nomes_codificados)
+
+    def escrever_binario(self, buffer):
+        nomes_codificados = self._nomes_codificados()
+        n, m = len(self.nomes), len(self.destinos)
+        flags = ((0 if self.pesos_inteiros else 1) | (2 if self.xs is not None else 0)
+                 | (4 if self.perfis is not None else 0) | 8)
+        destino = memoryview(buffer).cast('B')
+        self._CABECALHO.pack_into(destino, 0, self._ASSINATURA, n, m, flags, len(nomes_codificados))
+
+        posicao = self._CABECALHO.size
+        arrays = [self.inicios, self.destinos, self.pesos]
+        if self.xs is not None:
+            arrays += [self.xs, self.ys]
+        arrays += self._arrays_perfis()
+        for valores in arrays:
+            dados = memoryview(valores).cast('B')
+            destino[posicao:posicao + len(dados)] = dados
+            posicao += len(dados)
+        destino[posicao:posicao + len(nomes_codificados)] = nomes_codificados
+        return posicao + len(nomes_codificados)
+
+    @classmethod
+    def de_buffer(cls, buffer):
+        # Os arrays viram memoryviews sobre o próprio buffer: nada é copiado
+        # além dos nomes, que precisam virar strings para o índice por nome.
+        origem = memoryview(buffer).cast('B')
+        assinatura, n, m, flags, tamanho_nomes = cls._CABECALHO.unpack_from(origem, 0)
+        if assinatura != cls._ASSINATURA:
+            raise ValueError("Buffer não contém um grafo compacto.")
+
+        posicao = cls._CABECALHO.size
+
+        def fatia(tipo, quantidade):
+            nonlocal posicao
+            parte = origem[posicao:posicao + 8 * quantidade].cast(tipo)
+            posicao += 8 * quantidade
+            return parte
+
+        inicios = fatia('q', n + 1)
+        destinos = fatia('q', m)
+        pesos = fatia('d' if flags & 1 else 'q', m)
+        xs = ys = None
+        if flags & 2:
+            xs = fatia('d', n)
+            ys = fatia('d', n)
+        perfis = None
+        if flags & 4:
+            quantidade, pontos, periodo = fatia('q', 3)
+            perfis = PerfisHorario.de_arrays(fatia('q', m), fatia('q', quantidade + 1),
+                                             fatia('d', pontos), fatia('d', pontos), periodo)
+        nomes = bytes(origem[posicao:posicao + tamanho_nomes]).decode('utf-8').split('\0') if n else []
+        if not flags & 8:
+            destinos, pesos = cls._ordenar_linhas(inicios, destinos, pesos)
+        return cls(nomes, inicios, destinos, pesos, xs, ys, perfis)
+
+    @staticmethod
+    def _ordenar_linhas(inicios, destinos, pesos):
+        novos_destinos = array('q')
+        novos_pesos = array(pesos.format if isinstance(pesos, memoryview) else pesos.typecode)
+        for u in range(len(inicios) - 1):
+            a, b = inicios[u], inicios[u + 1]
+            for v, peso in sorted(zip(destinos[a:b], pesos[a:b])):
+                novos_destinos.append(v)
+                novos_pesos.append(peso)
+        return novos_destinos, novos_pesos
+
+    def salvar(self, caminho):
+        # Grava no formato binário acima. O arquivo é escrito ao lado e só
+        # substitui o antigo no fim, então um leitor nunca vê um grafo pela metade.
+        nomes_codificados = self._nomes_codificados()
+        tamanho = self.tamanho_binario(nomes_codificados)
+        temporario = f"{caminho}.tmp"
+        with open(temporario, 'w+b') as arquivo:
+            arquivo.truncate(tamanho)
+            with mmap.mmap(arquivo.fileno(), tamanho) as mapa:
+                self.escrever_binario(mapa)
+                mapa.flush()
+        os.replace(temporario, caminho)
+
+    @classmethod
+    def carregar(cls, caminho):
+        # Mapeia o arquivo na memória em vez de lê-lo: os arrays apontam
+        # direto para as páginas do arquivo, carregadas pelo sistema só
+        # quando usadas. O mapeamento é privado (copy-on-write), então
+        # atualizar pesos funciona sem alterar o arquivo.
+        with open(caminho, 'rb') as arquivo:
+            mapa = mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_COPY)
+        return cls.de_buffer(mapa)
+
+    def vizinhos(self, i):
+        for k in range(self.inicios[i], self.inicios[i + 1]):
+            yield self.destinos[k], self.pesos[k]
+
+    def posicao(self, i):
+        if self.xs is None or math.isnan(self.xs[i]):
+            return None
+        return self.xs[i], self.ys[i]
+
+    def aresta(self, origem, destino):
+        # Posição k da aresta origem -> destino nos arrays, em O(log grau):
+        # busca binária entre os vizinhos de origem, que ficam ordenados.
+        fim = self.inicios[origem + 1]
+        k = bisect_left(self.destinos, destino, self.inicios[origem], fim)
+        if k == fim or self.destinos[k] != destino:
+            raise KeyError((origem, destino))
+        return k
+
+    def reponderar(self, origem, destino, peso):
+        # Troca o peso de uma aresta existente nos dois sentidos e devolve o
+        # peso antigo. A estrutura do CSR não muda, só o valor no array.
+        ida, volta = self.aresta(origem, destino), self.aresta(destino, origem)
+        if self.pesos_inteiros and not isinstance(peso, int):
+            # Vira uma cópia própria em double (deixa de compartilhar a
+            # memória, se os pesos vinham de um buffer).
+            self.pesos = array('d', self.pesos)
+
+        antigo = self.pesos[ida]
+        self.pesos[ida] = peso
+        self.pesos[volta] = peso
+        return antigo
+
+
+class _VistaPorNome(Mapping):
+    # Expõe uma lista indexada por id como um dicionário indexado por nome,
+    # sem copiar nada.
+    __slots__ = ('_valores', '_compacto')
+
+    def __init__(self, valores, compacto):
+        self._valores = valores
+        self._compacto = compacto
+
+    def __getitem__(self, nome):
+        return self._valores[self._compacto.indices[nome]]
+
+    def __iter__(self):
+        return iter(self._compacto.nomes)
+
+    def __len__(self):
+        return len(self._compacto.nomes)
+
+
+class _VistaDistancias(_VistaPorNome):
+    # Distâncias em array('d'); com pesos inteiros devolve int, como o
+    # ArvoreCaminhos.
+    __slots__ = ('_inteiros',)
+
+    def __init__(self, valores, compacto):
+        super().__init__(valores, compacto)
+        self._inteiros = compacto.pesos_inteiros
+
+    def __getitem__(self, nome):
+        distancia = self._valores[self._compacto.indices[nome]]
+        if self._inteiros and distancia != float('inf'):
+            return int(distancia)
+        return distancia
+
+
+class _VistaAnteriores(_VistaPorNome):
+    # O anterior de cada nó: None ou -1 (nos arrays) na raiz e nos nós não
+    # alcançados.
+    __slots__ = ()
+
+    def __getitem__(self, nome):
+        anterior = self._valores[self._compacto.indices[nome]]
+        return None if anterior is None or anterior < 0 else self._compacto.nomes[anterior]
+
+
+class _AdjacenciasCompactas(Mapping):
+    # Substitui o dicionário de listas depois de compilar: os vizinhos de
+    # cada nó são montados sob demanda a partir dos arrays CSR.
+    __slots__ = ('_compacto',)
+
+    def __init__(self, compacto):
+        self._compacto = compacto
+
+    def __getitem__(self, nome):
+        g = self._compacto
+        nomes = g.nomes
+        return [(nomes[destino], peso) for destino, peso in g.vizinhos(g.indices[nome])]
+
+    def __iter__(self):
+        return iter(self._compacto.nomes)
+
+    def __len__(self):
+        return len(self._compacto.nomes)
+
+
+class _PosicoesCompactas(Mapping):
+    __slots__ = ('_compacto',)
+
+    def __init__(self, compacto):
+        self._compacto = compacto
+
+    def __getitem__(self, nome):
+        posicao = self._compacto.posicao(self._compacto.indices[nome])
+        if posicao is None:
+            raise KeyError(nome)
+        return posicao
+
+    def __iter__(self):
+        g = self._compacto
+        return (nome for i, nome in enumerate(g.nomes) if g.posicao(i) is not None)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+class MapaHospitais:
+    # Resultado de Grafo.mapear_hospitais_mais_proximos: depois da busca,
+    # cada consulta custa só o tamanho do caminho devolvido.
+    def __init__(self, distancias, hospital_de, proximos):
+        self.distancias = distancias
+        self.hospital_de = hospital_de
+        self.proximos = proximos
+
+    def consultar(self, pos_ambulancia):
+        hospital = self.hospital_de[pos_ambulancia]
+        if hospital is None:
+            return None, float('inf'), []
+
+        caminho = []
+        no = pos_ambulancia
+        while no is not None:
+            caminho.append(no)
+            no = self.proximos[no]
+        return hospital, self.distancias[pos_ambulancia], caminho
+
+
+class Grafo:
+    def __init__(self):
+        self.adjacencias = {}
+        self.posicoes = {}
+        # (origem, destino) -> posição do destino em adjacencias[origem]
+        self._arestas = {}
+        self._compacto = None
+        self._fator = None
+        self._observadores = weakref.WeakSet()
+        # Toda mudança na estrutura ou nos pesos incrementa a versão, e os
+        # caches de resultados descartam o que foi calculado antes dela.
+        self.versao = 0
+        self.cache_arvores = CacheRotas(capacidade=16)
+        self.cache_rotas = CacheRotas(capacidade=1024)
+        self._indice_espacial = None
+        self._perfis = None
+
+    @property
+    def compilado(self):
+        return self._compacto is not None
+
+    def _verificar_mutavel(self):
+        if self._compacto is not None:
+            raise RuntimeError("O grafo já foi compilado e não aceita novos vértices ou arestas.")
+
+    def adicionar_vertice(self, nome, posicao=None):
+        self._verificar_mutavel()
+        if nome not in self.adjacencias:
+            self.adjacencias[nome] = []
+            self.versao += 1
+        if posicao is not None:
+            self.posicoes[nome] = posicao
+            self._fator = None
+            self._indice_espacial = None
+            self.versao += 1
+
+    def adicionar_aresta(self, origem, destino, peso):
+        # Se a rua já existe, só o tempo dela muda (nos dois sentidos). No
+        # grafo compilado é a única alteração permitida.
+        if self._compacto is not None:
+            try:
+                self.atualizar_peso(origem, destino, peso)
+            except KeyError:
+                raise RuntimeError("O grafo já foi compilado e não aceita novos vértices ou arestas.") from None
+            return
+
+        if self._reponderar_dicionario(origem, destino, peso) is None:
+            self._arestas[(origem, destino)] = len(self.adjacencias[origem])
+            self.adjacencias[origem].append((destino, peso))
+            self._arestas[(destino, origem)] = len(self.adjacencias[destino])
+            self.adjacencias[destino].append((origem, peso))
+        self._fator = None
+        self.versao += 1
+
+    def _reponderar_dicionario(self, origem, destino, peso):
+        if (origem, destino) not in self._arestas:
+            return None
+        for a, b in ((origem, destino), (destino, origem)):
+            i = self._arestas[(a, b)]
+            antigo = self.adjacencias[a][i][1]
+            self.adjacencias[a][i] = (b, peso)
+        return antigo
+
+    def peso(self, origem, destino):
+        # Tempo da rua origem -> destino; KeyError se ela não existir.
+        if self._compacto is None:
+            return self.adjacencias[origem][self._arestas[(origem, destino)]][1]
+        g = self._compacto
+        try:
+            return g.pesos[g.aresta(g.indices[origem], g.indices[destino])]
+        except KeyError:
+            raise KeyError((origem, destino)) from None
+
+    def custo_caminho(self, caminho):
+        # Soma os tempos das ruas de um caminho já conhecido, sem varrer
+        # listas de vizinhos.
+        custo = 0
+        for origem, destino in zip(caminho, caminho[1:]):
+            custo += self.peso(origem, destino)
+        return custo
+
+    def atualizar_peso(self, origem, destino, novo_peso):
+        self.atualizar_pesos([(origem, destino, novo_peso)])
+
+    def atualizar_pesos(self, alteracoes):
+        # Lote de (origem, destino, novo_peso) em ruas que já existem (KeyError
+        # se não existir; ValueError se o novo peso de uma rua com perfil de
+        # horário violar a propriedade FIFO). No grafo compilado o CSR é
+        # alterado no lugar e quem mantém árvores de caminhos (ArvoreCaminhos,
+        # TabelaHospitais) é avisado uma vez só por lote, com a variação
+        # líquida de cada rua.
+        if self._compacto is None:
+            # Todas as ruas são conferidas antes de mudar qualquer peso: um
+            # lote com rua inexistente não é aplicado pela metade, nos dois
+            # modos.
+            alteracoes = list(alteracoes)
+            for origem, destino, _ in alteracoes:
+                if (origem, destino) not in self._arestas:
+                    raise KeyError((origem, destino))
+            for origem, destino, peso in alteracoes:
+                self._reponderar_dicionario(origem, destino, peso)
+            self._fator = None
+            self.versao += 1
+            return
+
+        g, perfis = self._compacto, self._perfis
+        # Aqui também todas as ruas são localizadas no CSR, e os novos pesos
+        # das que têm perfil conferidos, antes do primeiro peso alterado.
+        lote = []
+        for origem, destino, peso in alteracoes:
+            try:
+                u, v = g.indices[origem], g.indices[destino]
+                ida, volta = g.aresta(u, v), g.aresta(v, u)
+            except KeyError:
+                raise KeyError((origem, destino)) from None
+            if perfis is not None:
+                perfis.verificar_peso(ida, peso)
+                perfis.verificar_peso(volta, peso)
+            lote.append((u, v, peso))
+
+        liquidas = {}
+        for u, v, peso in lote:
+            antigo = g.reponderar(u, v, peso)
+            chave = (u, v) if u <= v else (v, u)
+            if chave in liquidas:
+                antigo = liquidas[chave][2]
+            liquidas[chave] = (u, v, antigo, peso)
+        aplicadas = [alteracao for alteracao in liquidas.values() if alteracao[2] != alteracao[3]]
+        self._ajustar_fator(aplicadas)
+        if aplicadas:
+            self.versao += 1
+            for observador in list(self._observadores):
+                observador.arestas_alteradas(aplicadas)
+
+    def definir_perfil(self, origem, destino, instantes, fatores):
+        # O tempo da rua passa a depender do horário: em instantes[i] (minutos
+        # desde a meia-noite) ela leva peso * fatores[i], com variação linear
+        # entre os pontos. Vale nos dois sentidos e só para as buscas
+        # dependentes do horário; dijkstra() e as árvores seguem com o peso
+        # fixo. Como arvore_caminhos, compila o grafo.
+        self.compilar()
+        g = self._compacto
+        if self._perfis is None:
+            self._perfis = g.perfis = PerfisHorario(len(g.destinos))
+        perfil = self._perfis.perfil(instantes, fatores)
+        try:
+            u, v = g.indices[origem], g.indices[destino]
+            arestas = (g.aresta(u, v), g.aresta(v, u))
+        except KeyError:
+            raise KeyError((origem, destino)) from None
+        for k in arestas:
+            self._perfis.atribuir(k, perfil, g.pesos[k])
+
+    def _ajustar_fator(self, alteracoes):
+        # Um peso maior não torna a heurística do A* otimista, então só as
+        # reduções podem baixar o fator; não é preciso recalculá-lo do zero.
+        if not self._fator:
+            return
+        for u, v, antigo, novo in alteracoes:
+            if novo < antigo:
+                posicao_u, posicao_v = self._posicao(u), self._posicao(v)
+                comprimento = math.dist(posicao_u, posicao_v)
+                if comprimento > 0:
+                    self._fator = min(self._fator, novo / comprimento * (1 - 1e-9))
+
+    def observar(self, observador):
+        # `observador.arestas_alteradas(alteracoes)` é chamado após cada
+        # lote de mudanças de peso, com tuplas (u, v, peso_antigo, peso_novo) em ids
+        # do CSR. A referência é fraca: o observador some junto com o dono.
+        self._observadores.add(observador)
+
+    def compilar(self):
+        # Congela o grafo no formato CSR. Depois disso as buscas rodam sobre
+        # ids inteiros e arrays, e `adjacencias` vira uma vista somente leitura.
+        if self._compacto is None:
+            self._compacto = GrafoCompacto.de_adjacencias(self.adjacencias, self.posicoes)
+            self.adjacencias = _AdjacenciasCompactas(self._compacto)
+            self.posicoes = _PosicoesCompactas(self._compacto)
+            self._arestas = None
+            self._dimensionar_cache_arvores()
+            self.versao += 1
+        return self
+
+    def _dimensionar_cache_arvores(self):
+        por_arvore = 16 * max(1, len(self._compacto))
+        self.cache_arvores.capacidade = max(1, min(self.cache_arvores.capacidade,
+                                                   MEMORIA_CACHE_ARVORES // por_arvore))
+
+    @classmethod
+    def de_compacto(cls, compacto):
+        # Grafo já compilado a partir de um CSR pronto (ex.: lido de um buffer).
+        grafo = cls()
+        grafo._compacto = compacto
+        grafo.adjacencias = _AdjacenciasCompactas(compacto)
+        grafo.posicoes = _PosicoesCompactas(compacto)
+        grafo._arestas = None
+        grafo._perfis = compacto.perfis
+        grafo._dimensionar_cache_arvores()
+        return grafo
+
+    def salvar(self, caminho):
+        # Formato binário do CSR (ver GrafoCompacto.salvar), com os perfis de
+        # horário; serve também para grafos ainda não compilados, sem congelá-los.
+        self.como_compacto().salvar(caminho)
+
+    @classmethod
+    def carregar(cls, caminho):
+        # Grafo compilado lido do arquivo via mmap, sem reconstruí-lo rua por rua.
+        return cls.de_compacto(GrafoCompacto.carregar(caminho))
+
+    def indice_espacial(self):
+        # Índice de grade sobre as posições, montado na primeira consulta e
+        # refeito só quando alguma posição muda.
+        if self._indice_espacial is None:
+            self._indice_espacial = IndiceEspacial.de_grafo(self)
+        return self._indice_espacial
+
+    def local_mais_proximo(self, posicao):
+        # Nome do local mais próximo de uma coordenada (no mesmo sistema das
+        # posições), para rotear ocorrências que chegam como coordenadas.
+        nome, _ = self.indice_espacial().mais_proximo(*posicao)
+        return nome
+
+    def como_compacto(self):
+        # CSR do grafo para pré-processamentos externos. Se o grafo ainda não
+        # foi compilado, gera uma cópia sem congelá-lo.
+        if self._compacto is not None:
+            return self._compacto
+        return GrafoCompacto.de_adjacencias(self.adjacencias, self.posicoes)
+
+    # Os algoritmos abaixo são escritos uma vez só e funcionam nos dois
+    # modos: antes de compilar os nós são os próprios nomes; depois, ids
+    # inteiros do CSR. Estes auxiliares fazem a tradução nas bordas.
+
+    def _id(self, nome):
+        return nome if self._compacto is None else self._compacto.indices[nome]
+
+    def _nome(self, no):
+        return no if self._compacto is None else self._compacto.nomes[no]
+
+    def _posicao(self, no):
+        if self._compacto is None:
+            return self.posicoes.get(no)
+        return self._compacto.posicao(no)
+
+    def _caminho_interno(self, anteriores, no):
+        caminho = []
+        while no is not None:
+            caminho.append(self._nome(no))
+            no = anteriores[no]
+        caminho.reverse()
+        return caminho
+
+    def _vetor(self, valor):
+        if self._compacto is None:
+            return dict.fromkeys(self.adjacencias, valor)
+        return [valor] * len(self._compacto)
+
+    def _vista(self, vetor):
+        return vetor if self._compacto is None else _VistaPorNome(vetor, self._compacto)
+
+    def _vista_anteriores(self, vetor):
+        return vetor if self._compacto is None else _VistaAnteriores(vetor, self._compacto)
+
+    def _vizinhos(self):
+        if self._compacto is None:
+            return self.adjacencias.__getitem__
+
+        inicios, destinos, pesos = self._compacto.inicios, self._compacto.destinos, self._compacto.pesos
+
+        def vizinhos(no):
+            a, b = inicios[no], inicios[no + 1]
+            return zip(destinos[a:b], pesos[a:b])
+
+        return vizinhos
+
+    def estatisticas_cache(self):
+        return {'arvores': self.cache_arvores.estatisticas(), 'rotas': self.cache_rotas.estatisticas()}
+
+    def dijkstra(self, inicio):
+        # Árvores repetidas saem do cache enquanto o grafo não mudar. No modo
+        # dicionário devolvemos cópias, para que quem altere o resultado não
+        # estrague a entrada guardada; no compilado as vistas já são só leitura.
+        resultado = self.cache_arvores.obter(inicio, self.versao)
+        if resultado is None:
+            with instrumentacao.etapa('grafo.dijkstra'):
+                if self._compacto is not None:
+                    resultado = self._dijkstra_compacto(inicio)
+                else:
+                    resultado = self._dijkstra_dicionario(inicio)
+            self.cache_arvores.guardar(inicio, self.versao, resultado)
+        if self._compacto is None:
+            distancias, anteriores = resultado
+            return dict(distancias), dict(anteriores)
+        return resultado
+
+    def _dijkstra_dicionario(self, inicio):
+        distancias = {no: float('inf') for no in self.adjacencias}
+        distancias[inicio] = 0
+        anteriores = {no: None for no in self.adjacencias}
+        fila = [(0, inicio)]
+
+        retiradas = descartadas = 0
+        while fila:
+            distancia_atual, no_atual = heapq.heappop(fila)
+            retiradas += 1
+            if distancia_atual > distancias[no_atual]:
+                descartadas += 1
+                continue
+
+            for vizinho, peso in self.adjacencias[no_atual]:
+                nova_distancia = distancia_atual + peso
+                if nova_distancia < distancias[vizinho]:
+                    distancias[vizinho] = nova_distancia
+                    anteriores[vizinho] = no_atual
+                    heapq.heappush(fila, (nova_distancia, vizinho))
+
+        if instrumentacao.ativo:
+            instrumentacao.busca('dijkstra', retiradas, descartadas, 0)
+        return distancias, anteriores
+
+    def _dijkstra_compacto(self, inicio):
+        g = self._compacto
+        inicios, destinos, pesos = g.inicios, g.destinos, g.pesos
+        origem = g.indices[inicio]
+
+        # As árvores vão para o cache_arvores: como no ArvoreCaminhos, ficam em
+        # arrays (distâncias em double, anteriores com -1 na raiz e nos nós
+        # não alcançados), 16 bytes por nó em vez de dois objetos Python.
+        distancias = [float('inf')] * len(g)
+        distancias[origem] = 0
+        anteriores = [-1] * len(g)
+        fila = [(0, origem)]
+
+        retiradas = descartadas = 0
+        while fila:
+            distancia_atual, no_atual = heapq.heappop(fila)
+            retiradas += 1
+            if distancia_atual > distancias[no_atual]:
+                descartadas += 1
+                continue
+
+            for k in range(inicios[no_atual], inicios[no_atual + 1]):
+                vizinho = destinos[k]
+                nova_distancia = distancia_atual + pesos[k]
+                if nova_distancia < distancias[vizinho]:
+                    distancias[vizinho] = nova_distancia
+                    anteriores[vizinho] = no_atual
+                    heapq.heappush(fila, (nova_distancia, vizinho))
+
+        if instrumentacao.ativo:
+            instrumentacao.busca('dijkstra', retiradas, descartadas, 0)
+        return _VistaDistancias(array('d', distancias), g), _VistaAnteriores(array('q', anteriores), g)
+
+    def _busca_dependente(self, origem, partida, alvo=None):
+        # Dijkstra em que o peso de cada rua é avaliado no instante em que ela
+        # é alcançada (partida + distância até ali). Com perfis FIFO, isso dá
+        # os menores tempos exatos. Para no `alvo`, se houver. Ruas sem
+        # perfil, a maioria, não pagam a chamada a PerfisHorario.fator.
+        g, perfis = self._compacto, self._perfis
+        inicios, destinos, pesos = g.inicios, g.destinos, g.pesos
+        perfil_de, fator = perfis.perfil_de, perfis.fator
+
+        distancias = [float('inf')] * len(g)
+        distancias[origem] = 0
+        anteriores = [None] * len(g)
+        fila = [(0, origem)]
+
+        while fila:
+            distancia_atual, no_atual = heapq.heappop(fila)
+            if distancia_atual > distancias[no_atual]:
+                continue
+            if no_atual == alvo:
+                break
+
+            instante = partida + distancia_atual
+            for k in range(inicios[no_atual], inicios[no_atual + 1]):
+                vizinho = destinos[k]
+                perfil = perfil_de[k]
+                if perfil < 0:
+                    nova_distancia = distancia_atual + pesos[k]
+                else:
+                    nova_distancia = distancia_atual + pesos[k] * fator(perfil, instante)
+                if nova_distancia < distancias[vizinho]:
+                    distancias[vizinho] = nova_distancia
+                    anteriores[vizinho] = no_atual
+                    heapq.heappush(fila, (nova_distancia, vizinho))
+
+        return distancias, anteriores
+
+    def dijkstra_dependente(self, inicio, partida):
+        # Como dijkstra(inicio), saindo no instante `partida` (minutos desde a
+        # meia-noite). As distâncias são durações a partir da partida.
+        if self._perfis is None:
+            return self.dijkstra(inicio)
+        distancias, anteriores = self._busca_dependente(self._compacto.indices[inicio], partida)
+        return _VistaPorNome(distancias, self._compacto), _VistaAnteriores(anteriores, self._compacto)
+
+    def reconstruir_caminho(self, anteriores, destino):
+        with instrumentacao.etapa('grafo.reconstruir_caminho'):
+            caminho = list(self.iterar_caminho(anteriores, destino))
+        caminho.reverse()
+        return caminho
+
+    def iterar_caminho(self, anteriores, destino):
+        # Gera o caminho sob demanda, do destino até a origem da busca. Como as
+        # ruas são de mão dupla, quem só quer os primeiros trechos de uma
+        # viagem A -> B pode usar a árvore de B e iterar a partir de A.
+        while destino is not None:
+            yield destino
+            destino = anteriores[destino]
+
+    def caminho_compacto(self, anteriores, destino):
+        # Caminho (origem -> destino) como array de ids do CSR, sem criar uma
+        # string por nó. Só existe no grafo compilado.
+        if not isinstance(anteriores, _VistaAnteriores):
+            raise ValueError("caminho_compacto precisa dos anteriores de um grafo compilado.")
+        valores = anteriores._valores
+        caminho = array('q')
+        no = self._compacto.indices[destino]
+        while no is not None and no >= 0:
+            caminho.append(no)
+            no = valores[no]
+        caminho.reverse()
+        return caminho
+
+    def encontrar_hospital_mais_proximo(self, pos_ambulancia, hospitais):
+        # Dijkstra com parada antecipada: o primeiro hospital retirado da fila
+        # é o mais próximo, então não é preciso explorar o resto da cidade.
+        # Distâncias e anteriores ficam em dicionários esparsos, só com os nós
+        # alcançados, para o custo não depender do tamanho do grafo.
+        alvos = {self._id(hospital) for hospital in hospitais}
+        vizinhos = self._vizinhos()
+        inicio = self._id(pos_ambulancia)
+
+        distancias = {inicio: 0}
+        anteriores = {inicio: None}
+        fila = [(0, inicio)]
+
+        retiradas = descartadas = 0
+        while fila:
+            distancia_atual, no_atual = heapq.heappop(fila)
+            retiradas += 1
+            if distancia_atual > distancias[no_atual]:
+                descartadas += 1
+                continue
+
+            if no_atual in alvos:
+                if instrumentacao.ativo:
+                    instrumentacao.busca('hospital_mais_proximo', retiradas, descartadas, len(fila))
+                return self._nome(no_atual), distancia_atual, self._caminho_interno(anteriores, no_atual)
+
+            for vizinho, peso in vizinhos(no_atual):
+                nova_distancia = distancia_atual + peso
+                if nova_distancia < distancias.get(vizinho, float('inf')):
+                    distancias[vizinho] = nova_distancia
+                    anteriores[vizinho] = no_atual
+                    heapq.heappush(fila, (nova_distancia, vizinho))
+
+        if instrumentacao.ativo:
+            instrumentacao.busca('hospital_mais_proximo', retiradas, descartadas, 0)
+        return None, float('inf'), []
+
+    def distancias_ate(self, origem, alvos):
+        # Distância de `origem` a cada um dos `alvos` ({alvo: tempo}, inf se
+        # não houver caminho). Mesma parada antecipada de
+        # encontrar_hospital_mais_proximo, mas só quando todos os alvos
+        # tiverem sido retirados da fila.
+        faltam = {self._id(alvo) for alvo in alvos}
+        vizinhos = self._vizinhos()
+        inicio = self._id(origem)
+
+        distancias = {inicio: 0}
+        encontradas = {}
+        fila = [(0, inicio)]
+
+        while fila and faltam:
+            distancia_atual, no_atual = heapq.heappop(fila)
+            if distancia_atual > distancias[no_atual]:
+                continue
+
+            if no_atual in faltam:
+                faltam.discard(no_atual)
+                encontradas[self._nome(no_atual)] = distancia_atual
+
+            for vizinho, peso in vizinhos(no_atual):
+                nova_distancia = distancia_atual + peso
+                if nova_distancia < distancias.get(vizinho, float('inf')):
+                    distancias[vizinho] = nova_distancia
+                    heapq.heappush(fila, (nova_distancia, vizinho))
+
+        return {alvo: encontradas.get(alvo, float('inf')) for alvo in alvos}
+
+    def mapear_hospitais_mais_proximos(self, hospitais):
+        # Busca multi-origem: todos os hospitais entram na fila com distância
+        # zero. Como as arestas são de mão dupla, uma única passada dá, para
+        # cada nó da cidade, o hospital mais próximo e o próximo passo até ele.
+        distancias = self._vetor(float('inf'))
+        hospital_de = self._vetor(None)
+        proximos = self._vetor(None)
+        fila = []
+        for hospital in hospitais:
+            no = self._id(hospital)
+            distancias[no] = 0
+            hospital_de[no] = no
+            fila.append((0, no))
+        heapq.heapify(fila)
+        vizinhos = self._vizinhos()
+
+        while fila:
+            distancia_atual, no_atual = heapq.heappop(fila)
+            if distancia_atual > distancias[no_atual]:
+                continue
+
+            for vizinho, peso in vizinhos(no_atual):
+                nova_distancia = distancia_atual + peso
+                if nova_distancia < distancias[vizinho]:
+                    distancias[vizinho] = nova_distancia
+                    hospital_de[vizinho] = hospital_de[no_atual]
+                    proximos[vizinho] = no_atual
+                    heapq.heappush(fila, (nova_distancia, vizinho))
+
+        return MapaHospitais(self._vista(distancias),
+                             self._vista_anteriores(hospital_de),
+                             self._vista_anteriores(proximos))
+
+    def arvore_caminhos(self, raiz):
+        # Equivalente a dijkstra(raiz), mas em arrays compactos e mantido em
+        # dia a cada atualizar_peso/atualizar_pesos por reparo incremental.
+        return ArvoreCaminhos(self, raiz)
+
+    def menor_caminho(self, origem, destino):
+        # Rota ponto a ponto: A* quando há coordenadas para todos os nós,
+        # senão Dijkstra bidirecional. Devolve (tempo, caminho). Pares já
+        # consultados, sem mudança no grafo desde então, saem do cache.
+        resultado = self.cache_rotas.obter((origem, destino), self.versao)
+        if resultado is None:
+            with instrumentacao.etapa('grafo.menor_caminho'):
+                if self._fator_heuristica() > 0:
+                    tempo, caminho = self.a_estrela(origem, destino)
+                else:
+                    tempo, caminho = self.dijkstra_bidirecional(origem, destino)
+            resultado = (tempo, tuple(caminho))
+            self.cache_rotas.guardar((origem, destino), self.versao, resultado)
+        tempo, caminho = resultado
+        return tempo, list(caminho)
+
+    def menor_caminho_dependente(self, origem, destino, partida):
+        # (tempo, caminho) saindo de `origem` no instante `partida`. A busca
+        # para ao chegar no destino.
+        if self._perfis is None:
+            return self.menor_caminho(origem, destino)
+        g = self._compacto
+        alvo = g.indices[destino]
+        distancias, anteriores = self._busca_dependente(g.indices[origem], partida, alvo)
+        if distancias[alvo] == float('inf'):
+            return float('inf'), []
+        return distancias[alvo], self._caminho_interno(anteriores, alvo)
+
+    def dijkstra_bidirecional(self, origem, destino):
+        # Duas buscas, uma a partir de cada ponta, avançando sempre a de menor
+        # distância na fila. Param quando a soma dos topos das filas já não
+        # pode melhorar o melhor encontro achado.
+        inicio, alvo = self._id(origem), self._id(destino)
+        if inicio == alvo:
+            return 0, [origem]
+
+        vizinhos = self._vizinhos()
+        distancias = ({inicio: 0}, {alvo: 0})
+        anteriores = ({inicio: None}, {alvo: None})
+        filas = ([(0, inicio)], [(0, alvo)])
+        melhor = float('inf')
+        encontro = None
+        retiradas = descartadas = 0
+
+        while filas[0] and filas[1]:
+            if filas[0][0][0] + filas[1][0][0] >= melhor:
+                break
+
+            lado = 0 if filas[0][0][0] <= filas[1][0][0] else 1
+            fila, distancias_lado, anteriores_lado = filas[lado], distancias[lado], anteriores[lado]
+            distancias_outro = distancias[1 - lado]
+
+            distancia_atual, no_atual = heapq.heappop(fila)
+            retiradas += 1
+            if distancia_atual > distancias_lado[no_atual]:
+                descartadas += 1
+                continue
+
+            for vizinho, peso in vizinhos(no_atual):
+                nova_distancia = distancia_atual + peso
+                if nova_distancia < distancias_lado.get(vizinho, float('inf')):
+                    distancias_lado[vizinho] = nova_distancia
+                    anteriores_lado[vizinho] = no_atual
+                    heapq.heappush(fila, (nova_distancia, vizinho))
+                if vizinho in distancias_outro:
+                    total = distancias_lado[vizinho] + distancias_outro[vizinho]
+                    if total < melhor:
+                        melhor = total
+                        encontro = vizinho
+
+        if instrumentacao.ativo:
+            instrumentacao.busca('bidirecional', retiradas, descartadas, len(filas[0]) + len(filas[1]))
+        if encontro is None:
+            return float('inf'), []
+
+        caminho = self._caminho_interno(anteriores[0], encontro)
+        no = anteriores[1][encontro]
+        while no is not None:
+            caminho.append(self._nome(no))
+            no = anteriores[1][no]
+        return melhor, caminho
+
+    def _fator_heuristica(self):
+        # Maior f tal que f * (distância euclidiana) nunca passa do peso de uma
+        # aresta. Assim f * |v - destino| nunca passa do tempo real até o
+        # destino e a heurística do A* é admissível. Sem posição para todos os
+        # nós não há garantia, e o fator é 0 (o A* vira Dijkstra).
+        if self._fator is None:
+            vizinhos = self._vizinhos()
+            fator = float('inf')
+            for nome in self.adjacencias:
+                no = self._id(nome)
+                posicao = self._posicao(no)
+                if posicao is None:
+                    fator = 0
+                    break
+                for vizinho, peso in vizinhos(no):
+                    posicao_vizinho = self._posicao(vizinho)
+                    if posicao_vizinho is None:
+                        continue
+                    comprimento = math.dist(posicao, posicao_vizinho)
+                    if comprimento > 0:
+                        fator = min(fator, peso / comprimento)
+            if fator == float('inf'):
+                fator = 0
+            # Margem para erros de arredondamento não tornarem h otimista demais.
+            self._fator = fator * (1 - 1e-9)
+        return self._fator
+
+    def a_estrela(self, origem, destino):
+        inicio, alvo = self._id(origem), self._id(destino)
+        vizinhos = self._vizinhos()
+
+        fator = self._fator_heuristica()
+        posicao_alvo = self._posicao(alvo) if fator > 0 else None
+        if posicao_alvo is None:
+            def estimativa(no):
+                return 0
+        else:
+            posicao = self._posicao
+
+            def estimativa(no):
+                return fator * math.dist(posicao(no), posicao_alvo)
+
+        distancias = {inicio: 0}
+        anteriores = {inicio: None}
+        fila = [(estimativa(inicio), 0, inicio)]
+
+        retiradas = descartadas = 0
+        while fila:
+            _, distancia_atual, no_atual = heapq.heappop(fila)
+            retiradas += 1
+            if distancia_atual > distancias[no_atual]:
+                descartadas += 1
+                continue
+
+            if no_atual == alvo:
+                if instrumentacao.ativo:
+                    instrumentacao.busca('a_estrela', retiradas, descartadas, len(fila))
+                return distancia_atual, self._caminho_interno(anteriores, no_atual)
+
+            for vizinho, peso in vizinhos(no_atual):
+                nova_distancia = distancia_atual + peso
+                if nova_distancia < distancias.get(vizinho, float('inf')):
+                    distancias[vizinho] = nova_distancia
+                    anteriores[vizinho] = no_atual
+                    heapq.heappush(fila, (nova_distancia + estimativa(vizinho), nova_distancia, vizinho))
+
+        if instrumentacao.ativo:
+            instrumentacao.busca('a_estrela', retiradas, descartadas, 0)
+        return float('inf'), []
+
+    def animar_rota(self, ambulancia, hospitais, caminho, tempo_total):
+        # Bibliotecas de visualização só são necessárias aqui; importá-las no
+        # topo impediria usar o grafo em máquinas sem interface gráfica.
+        from visualizacao import animar_rota
+        animar_rota(self, ambulancia, hospitais, caminho, tempo_total)
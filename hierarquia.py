@@ -0,0 +1,245 @@
+import heapq
+import pickle
+from array import array
+
+
+class HierarquiaContracao:
+    # Contraction Hierarchies: os nós são "contraídos" um a um, em ordem de
+    # importância, e cada contração acrescenta atalhos que preservam as
+    # menores distâncias entre os vizinhos restantes. Uma consulta é então
+    # uma busca bidirecional que só sobe na hierarquia, visitando poucas
+    # centenas de nós mesmo em grafos enormes.
+    #
+    # Só as arestas "para cima" (do nó de nível menor para o de nível maior)
+    # são guardadas, em CSR: inicios/destinos/pesos, e em `meios` o nó
+    # contraído que cada atalho substitui (-1 para ruas originais). Como as
+    # arestas do Grafo são de mão dupla, o mesmo grafo serve às duas buscas.
+    def __init__(self, nomes, niveis, inicios, destinos, pesos, meios):
+        self.nomes = nomes
+        self.indices = {nome: i for i, nome in enumerate(nomes)}
+        self.niveis = niveis
+        self.inicios = inicios
+        self.destinos = destinos
+        self.pesos = pesos
+        self.meios = meios
+
+    @classmethod
+    def construir(cls, grafo, limite_testemunha=500):
+        g = grafo.como_compacto()
+        n = len(g)
+
+        adjacentes = [{} for _ in range(n)]
+        for u in range(n):
+            for k in range(g.inicios[u], g.inicios[u + 1]):
+                v, peso = g.destinos[k], g.pesos[k]
+                if v != u and peso < adjacentes[u].get(v, float('inf')):
+                    adjacentes[u][v] = peso
+                    adjacentes[v][u] = peso
+
+        meios = {}
+        vizinhos_contraidos = [0] * n
+
+        def testemunhas(origem, evitar, limite, alvos):
+            # Dijkstra local que ignora o nó sendo contraído: se achar um
+            # caminho até o alvo tão curto quanto o atalho, ele é dispensável.
+            # A busca é limitada; parar cedo só gera atalhos a mais, nunca
+            # uma resposta errada.
+            distancias = {origem: 0}
+            fila = [(0, origem)]
+            restantes = len(alvos)
+            assentados = 0
+            while fila and restantes and assentados < limite_testemunha:
+                distancia_atual, no_atual = heapq.heappop(fila)
+                if distancia_atual > distancias[no_atual]:
+                    continue
+                if distancia_atual > limite:
+                    break
+                assentados += 1
+                if no_atual in alvos:
+                    restantes -= 1
+                for vizinho, peso in adjacentes[no_atual].items():
+                    if vizinho == evitar:
+                        continue
+                    nova_distancia = distancia_atual + peso
+                    if nova_distancia < distancias.get(vizinho, float('inf')):
+                        distancias[vizinho] = nova_distancia
+                        heapq.heappush(fila, (nova_distancia, vizinho))
+            return distancias
+
+        def atalhos(v):
+            vizinhos = list(adjacentes[v].items())
+            necessarios = []
+            for i, (u, peso_u) in enumerate(vizinhos[:-1]):
+                outros = vizinhos[i + 1:]
+                limite = peso_u + max(peso for _, peso in outros)
+                distancias = testemunhas(u, v, limite, {w for w, _ in outros})
+                for w, peso_w in outros:
+                    via_v = peso_u + peso_w
+                    if distancias.get(w, float('inf')) > via_v:
+                        necessarios.append((u, w, via_v))
+            return necessarios
+
+        def prioridade(v, novos):
+            # Diferença de arestas mais vizinhos já contraídos: contrai antes
+            # quem gera poucos atalhos, espalhando a contração pelo grafo.
+            return len(novos) - len(adjacentes[v]) + vizinhos_contraidos[v]
+
+        fila = [(prioridade(v, atalhos(v)), v) for v in range(n)]
+        heapq.heapify(fila)
+
+        niveis = array('q', bytes(8 * n))
+        subidas = [None] * n
+        nivel = 0
+        while fila:
+            _, v = heapq.heappop(fila)
+            novos = atalhos(v)
+            atual = prioridade(v, novos)
+            if fila and atual > fila[0][0]:
+                heapq.heappush(fila, (atual, v))
+                continue
+
+            niveis[v] = nivel
+            nivel += 1
+            subidas[v] = [(u, peso, meios.get((min(u, v), max(u, v)), -1))
+                          for u, peso in adjacentes[v].items()]
+
+            for u, w, peso in novos:
+                if peso < adjacentes[u].get(w, float('inf')):
+                    adjacentes[u][w] = peso
+                    adjacentes[w][u] = peso
+                    meios[(min(u, w), max(u, w))] = v
+
+            for u in adjacentes[v]:
+                del adjacentes[u][v]
+                vizinhos_contraidos[u] += 1
+            adjacentes[v] = None
+
+        inicios = array('q', [0])
+        destinos = array('q')
+        pesos = array('q' if g.pesos_inteiros else 'd')
+        meios_atalhos = array('q')
+        for v in range(n):
+            for u, peso, meio in subidas[v]:
+                destinos.append(u)
+                pesos.append(peso)
+                meios_atalhos.append(meio)
+            inicios.append(len(destinos))
+
+        return cls(list(g.nomes), niveis, inicios, destinos, pesos, meios_atalhos)
+
+    def salvar(self, caminho):
+        with open(caminho, 'wb') as arquivo:
+            pickle.dump({
+                'nomes': self.nomes,
+                'niveis': self.niveis,
+                'inicios': self.inicios,
+                'destinos': self.destinos,
+                'pesos': self.pesos,
+                'meios': self.meios,
+            }, arquivo, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def carregar(cls, caminho):
+        with open(caminho, 'rb') as arquivo:
+            dados = pickle.load(arquivo)
+        return cls(dados['nomes'], dados['niveis'], dados['inicios'],
+                   dados['destinos'], dados['pesos'], dados['meios'])
+
+    def _buscar(self, inicio, alvo):
+        inicios, destinos, pesos = self.inicios, self.destinos, self.pesos
+        distancias = ({inicio: 0}, {alvo: 0})
+        anteriores = ({inicio: None}, {alvo: None})
+        filas = ([(0, inicio)], [(0, alvo)])
+        melhor = float('inf') if inicio != alvo else 0
+        encontro = inicio if inicio == alvo else None
+
+        while filas[0] or filas[1]:
+            for lado in (0, 1):
+                fila = filas[lado]
+                if not fila:
+                    continue
+                distancias_lado, anteriores_lado = distancias[lado], anteriores[lado]
+
+                distancia_atual, no_atual = heapq.heappop(fila)
+                if distancia_atual > distancias_lado[no_atual]:
+                    continue
+                if distancia_atual >= melhor:
+                    fila.clear()
+                    continue
+
+                outra = distancias[1 - lado].get(no_atual)
+                if outra is not None and distancia_atual + outra < melhor:
+                    melhor = distancia_atual + outra
+                    encontro = no_atual
+
+                # Stall-on-demand: se algum vizinho de nível maior já chega a
+                # este nó por um caminho mais curto, a distância dele aqui não
+                # é a menor e não vale a pena expandi-lo.
+                faixa = range(inicios[no_atual], inicios[no_atual + 1])
+                if any(distancias_lado.get(destinos[k], float('inf')) + pesos[k] < distancia_atual
+                       for k in faixa):
+                    continue
+
+                for k in faixa:
+                    vizinho = destinos[k]
+                    nova_distancia = distancia_atual + pesos[k]
+                    if nova_distancia < distancias_lado.get(vizinho, float('inf')):
+                        distancias_lado[vizinho] = nova_distancia
+                        anteriores_lado[vizinho] = no_atual
+                        heapq.heappush(fila, (nova_distancia, vizinho))
+
+        return melhor, encontro, anteriores
+
+    def distancia(self, origem, destino):
+        melhor, _, _ = self._buscar(self.indices[origem], self.indices[destino])
+        return melhor
+
+    def _aresta(self, a, b):
+        # Cada par aparece uma vez só, na lista do nó de nível menor.
+        baixo, alto = (a, b) if self.niveis[a] < self.niveis[b] else (b, a)
+        for k in range(self.inicios[baixo], self.inicios[baixo + 1]):
+            if self.destinos[k] == alto:
+                return k
+        raise KeyError((a, b))
+
+    def _desempacotar(self, a, b, caminho, pesos):
+        pilha = [(a, b)]
+        while pilha:
+            a, b = pilha.pop()
+            k = self._aresta(a, b)
+            meio = self.meios[k]
+            if meio < 0:
+                caminho.append(b)
+                pesos.append(self.pesos[k])
+            else:
+                pilha.append((meio, b))
+                pilha.append((a, meio))
+
+    def consultar(self, origem, destino):
+        # Mesmo contrato de Grafo.menor_caminho: devolve (tempo, caminho).
+        melhor, encontro, anteriores = self._buscar(self.indices[origem], self.indices[destino])
+        if encontro is None:
+            return float('inf'), []
+
+        subida = []
+        no = encontro
+        while no is not None:
+            subida.append(no)
+            no = anteriores[0][no]
+        subida.reverse()
+        no = anteriores[1][encontro]
+        while no is not None:
+            subida.append(no)
+            no = anteriores[1][no]
+
+        caminho = [subida[0]]
+        pesos = []
+        for a, b in zip(subida, subida[1:]):
+            self._desempacotar(a, b, caminho, pesos)
+
+        # Soma na ordem do percurso, como o Dijkstra faz, para o tempo bater
+        # exatamente também com pesos fracionários.
+        tempo = 0
+        for peso in pesos:
+            tempo += peso
+        return tempo, [self.nomes[no] for no in caminho]
@@ -0,0 +1,339 @@
+import argparse
+import bz2
+import csv
+import gzip
+import io
+import json
+import math
+import sys
+import time
+import xml.etree.ElementTree as ET
+from array import array
+
+from grafo import Grafo, GrafoCompacto
+
+
+# Importação de redes viárias grandes direto para o formato compacto (CSR),
+# sem passar pelas listas de adjacência do Grafo nem guardar o arquivo
+# inteiro na memória. Lê listas de arestas em CSV ou JSONL e mapas OSM em
+# XML (também .gz/.bz2), sempre em fluxo.
+
+# Vias por onde uma ambulância pode andar e a velocidade (km/h) usada quando
+# a via não informa `maxspeed`.
+VELOCIDADES = {
+    'motorway': 100, 'motorway_link': 60,
+    'trunk': 80, 'trunk_link': 50,
+    'primary': 60, 'primary_link': 40,
+    'secondary': 50, 'secondary_link': 40,
+    'tertiary': 40, 'tertiary_link': 30,
+    'unclassified': 30, 'residential': 30, 'road': 30,
+    'living_street': 10, 'service': 20,
+}
+
+_SEM_ACESSO = {'no', 'private'}
+_RAIO_TERRA_KM = 6371.0088
+
+
+def _abrir(caminho, modo='rb'):
+    if caminho.endswith('.gz'):
+        return gzip.open(caminho, modo)
+    if caminho.endswith('.bz2'):
+        return bz2.open(caminho, modo)
+    return open(caminho, modo)
+
+
+def _peso(texto):
+    try:
+        return int(texto)
+    except ValueError:
+        return float(texto)
+
+
+class ConstrutorCSR:
+    # Acumula ruas em arrays planos (origem, destino, peso) e só no fim monta
+    # o CSR, com uma ordenação por contagem. Assim a memória fica em poucos
+    # bytes por rua, em vez de uma tupla por sentido como no Grafo.
+    def __init__(self):
+        self.nomes = []
+        self.indices = {}
+        self._origens = array('q')
+        self._destinos = array('q')
+        self._pesos = array('d')
+        self._pesos_inteiros = True
+        self._xs = array('d')
+        self._ys = array('d')
+        self._com_posicao = False
+
+    def vertice(self, nome, posicao=None):
+        i = self.indices.get(nome)
+        if i is None:
+            i = self.indices[nome] = len(self.nomes)
+            self.nomes.append(nome)
+            self._xs.append(math.nan)
+            self._ys.append(math.nan)
+        if posicao is not None:
+            self._xs[i], self._ys[i] = posicao
+            self._com_posicao = True
+        return i
+
+    def aresta(self, origem, destino, peso):
+        u, v = self.vertice(origem), self.vertice(destino)
+        if u == v:
+            return
+        if self._pesos_inteiros and not isinstance(peso, int):
+            self._pesos_inteiros = False
+        self._origens.append(u)
+        self._destinos.append(v)
+        self._pesos.append(peso)
+
+    def __len__(self):
+        return len(self._origens)
+
+    def compacto(self):
+        n, m = len(self.nomes), len(self._origens)
+        inicios = array('q', bytes(8 * (n + 1)))
+        for u in self._origens:
+            inicios[u + 1] += 1
+        for v in self._destinos:
+            inicios[v + 1] += 1
+        for i in range(n):
+            inicios[i + 1] += inicios[i]
+
+        # Ruas de mão dupla, como em Grafo.adicionar_aresta: cada uma entra
+        # nos dois sentidos.
+        proximo = inicios[:-1]
+        destinos = array('q', bytes(16 * m))
+        pesos = array('d', bytes(16 * m))
+        for u, v, peso in zip(self._origens, self._destinos, self._pesos):
+            k = proximo[u]
+            destinos[k], pesos[k] = v, peso
+            proximo[u] = k + 1
+            k = proximo[v]
+            destinos[k], pesos[k] = u, peso
+            proximo[v] = k + 1
+
+        inicios, destinos, pesos = self._sem_repeticoes(inicios, destinos, pesos)
+        if self._pesos_inteiros:
+            pesos = array('q', map(int, pesos))
+        xs, ys = (self._xs, self._ys) if self._com_posicao else (None, None)
+        return GrafoCompacto(self.nomes, inicios, destinos, pesos, xs, ys)
+
+    @staticmethod
+    def _sem_repeticoes(inicios, destinos, pesos):
+        # Cada linha do CSR fica em ordem crescente de destino (GrafoCompacto
+        # acha as arestas por busca binária), e duas ruas entre o mesmo par de
+        # locais (ex.: duas vias OSM ligando os mesmos cruzamentos) viram uma
+        # só, com o menor tempo. Nos dois sentidos o resultado é o mesmo, então
+        # o grafo continua simétrico.
+        n = len(inicios) - 1
+        if all(destinos[k] < destinos[k + 1]
+               for u in range(n)
+               for k in range(inicios[u], inicios[u + 1] - 1)):
+            return inicios, destinos, pesos
+
+        novos_inicios = array('q', [0])
+        novos_destinos = array('q')
+        novos_pesos = array('d')
+        for u in range(n):
+            a, b = inicios[u], inicios[u + 1]
+            melhores = {}
+            for k in range(a, b):
+                v = destinos[k]
+                if v not in melhores or pesos[k] < melhores[v]:
+                    melhores[v] = pesos[k]
+            for v in sorted(melhores):
+                novos_destinos.append(v)
+                novos_pesos.append(melhores[v])
+            novos_inicios.append(len(novos_destinos))
+        return novos_inicios, novos_destinos, novos_pesos
+
+    def grafo(self):
+        return Grafo.de_compacto(self.compacto())
+
+
+def ler_arestas_csv(caminho):
+    # (origem, destino, peso) de um CSV com cabeçalho origem,destino,peso.
+    with _abrir(caminho) as binario:
+        leitor = csv.reader(io.TextIOWrapper(binario, encoding='utf-8', newline=''))
+        cabecalho = next(leitor, None)
+        if cabecalho is None:
+            return
+        try:
+            i, j, k = (cabecalho.index(coluna) for coluna in ('origem', 'destino', 'peso'))
+        except ValueError:
+            raise ValueError(f"{caminho}: o CSV precisa das colunas origem, destino e peso.") from None
+        for linha in leitor:
+            if linha:
+                yield linha[i], linha[j], _peso(linha[k])
+
+
+def ler_osm(caminho):
+    # Percorre um mapa OSM em XML elemento a elemento, devolvendo
+    # ('no', id, lat, lon) e ('via', refs, tags). Cada elemento é descartado
+    # logo depois de lido, então a memória não cresce com o arquivo.
+    with _abrir(caminho) as arquivo:
+        raiz = None
+        for evento, elemento in ET.iterparse(arquivo, events=('start', 'end')):
+            if raiz is None:
+                raiz = elemento
+                continue
+            if evento != 'end':
+                continue
+            if elemento.tag == 'node':
+                yield 'no', int(elemento.get('id')), float(elemento.get('lat')), float(elemento.get('lon'))
+            elif elemento.tag == 'way':
+                refs = [int(nd.get('ref')) for nd in elemento.iter('nd')]
+                tags = {tag.get('k'): tag.get('v') for tag in elemento.iter('tag')}
+                yield 'via', refs, tags
+            elif elemento.tag != 'relation':
+                continue
+            raiz.clear()
+
+
+def carrocavel(tags):
+    if tags.get('highway') not in VELOCIDADES or tags.get('area') == 'yes':
+        return False
+    return not any(tags.get(chave) in _SEM_ACESSO for chave in ('access', 'motor_vehicle', 'motorcar'))
+
+
+def velocidade(tags):
+    # km/h: `maxspeed` numérico (também "50 mph") ou o padrão da categoria.
+    maxspeed = (tags.get('maxspeed') or '').split(';')[0].strip()
+    partes = maxspeed.split()
+    if partes:
+        try:
+            valor = float(partes[0])
+        except ValueError:
+            pass
+        else:
+            if valor > 0:
+                return valor * 1.609344 if partes[-1] == 'mph' else valor
+    return VELOCIDADES[tags['highway']]
+
+
+def _distancia_km(lat1, lon1, lat2, lon2):
+    fi1, fi2 = math.radians(lat1), math.radians(lat2)
+    dfi, dlambda = fi2 - fi1, math.radians(lon2 - lon1)
+    a = math.sin(dfi / 2) ** 2 + math.cos(fi1) * math.cos(fi2) * math.sin(dlambda / 2) ** 2
+    return 2 * _RAIO_TERRA_KM * math.asin(math.sqrt(a))
+
+
+def importar_osm(caminho):
+    # Duas passadas pelo arquivo. A primeira só olha as vias carroçáveis e
+    # conta quantas vezes cada nó OSM aparece; viram vértices as pontas das
+    # vias e os nós compartilhados (cruzamentos). A segunda guarda as
+    # coordenadas desses nós e transforma cada trecho entre dois vértices
+    # numa rua, com o tempo de percurso em minutos. Os nós intermediários de
+    # uma via não entram no grafo: só somam distância ao trecho.
+    #
+    # Sentido único (`oneway`) é ignorado: no Grafo todas as ruas são de mão
+    # dupla, e as árvores de hospitais dependem disso.
+    indices = {}
+    usos = array('b')
+    for tipo, *dados in ler_osm(caminho):
+        if tipo != 'via' or not carrocavel(dados[1]):
+            continue
+        refs = dados[0]
+        for posicao, ref in enumerate(refs):
+            i = indices.get(ref)
+            if i is None:
+                i = indices[ref] = len(usos)
+                usos.append(0)
+            ponta = posicao == 0 or posicao == len(refs) - 1
+            usos[i] = 2 if ponta else min(usos[i] + 1, 2)
+
+    lats = array('d', [math.nan]) * len(usos)
+    lons = array('d', [math.nan]) * len(usos)
+    construtor = ConstrutorCSR()
+    for tipo, *dados in ler_osm(caminho):
+        if tipo == 'no':
+            i = indices.get(dados[0])
+            if i is not None:
+                lats[i], lons[i] = dados[1], dados[2]
+            continue
+
+        refs, tags = dados
+        if not carrocavel(tags):
+            continue
+        km_por_minuto = velocidade(tags) / 60
+        anterior = inicio = None
+        distancia = 0.0
+        for ref in refs:
+            i = indices[ref]
+            if math.isnan(lats[i]):
+                # Nó fora do recorte do mapa: o trecho é interrompido aqui.
+                anterior = inicio = None
+                continue
+            if anterior is not None:
+                distancia += _distancia_km(lats[anterior], lons[anterior], lats[i], lons[i])
+            anterior = i
+            if usos[i] >= 2:
+                nome = str(ref)
+                construtor.vertice(nome, (lons[i], lats[i]))
+                if inicio is not None:
+                    construtor.aresta(inicio, nome, distancia / km_por_minuto)
+                inicio, distancia = nome, 0.0
+    return construtor.grafo()
+
+
+def importar_csv(caminho):
+    construtor = ConstrutorCSR()
+    for origem, destino, peso in ler_arestas_csv(caminho):
+        construtor.aresta(origem, destino, peso)
+    return construtor.grafo()
+
+
+def ler_registros_jsonl(caminho):
+    # Um objeto JSON por linha: {"origem", "destino", "peso"} para ruas e
+    # {"vertice", "posicao": [x, y]} para coordenadas.
+    with _abrir(caminho) as binario:
+        for linha in io.TextIOWrapper(binario, encoding='utf-8'):
+            if linha.strip():
+                yield json.loads(linha)
+
+
+def importar_jsonl(caminho):
+    construtor = ConstrutorCSR()
+    for registro in ler_registros_jsonl(caminho):
+        if 'vertice' in registro:
+            posicao = registro.get('posicao')
+            construtor.vertice(registro['vertice'], tuple(posicao) if posicao else None)
+        else:
+            peso = registro['peso']
+            construtor.aresta(registro['origem'], registro['destino'], _peso(peso) if isinstance(peso, str) else peso)
+    return construtor.grafo()
+
+
+def importar(caminho, formato=None):
+    # Grafo compilado a partir de um .osm, .csv ou .jsonl (opcionalmente
+    # .gz/.bz2), ou no `formato` dado ('osm', 'csv' ou 'jsonl').
+    base = caminho
+    for compressao in ('.gz', '.bz2'):
+        if base.endswith(compressao):
+            base = base[:-len(compressao)]
+    if formato == 'osm' or (formato is None and base.endswith(('.osm', '.xml'))):
+        return importar_osm(caminho)
+    if formato == 'csv' or (formato is None and base.endswith('.csv')):
+        return importar_csv(caminho)
+    if formato == 'jsonl' or (formato is None and base.endswith('.jsonl')):
+        return importar_jsonl(caminho)
+    raise ValueError(f"Formato de rede não reconhecido: {caminho}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Importa uma rede viária (OSM XML, CSV ou JSONL) para o formato binário do grafo.")
+    parser.add_argument('entrada', help="arquivo .osm, .csv (origem,destino,peso), .jsonl ou as versões .gz/.bz2")
+    parser.add_argument('-o', '--saida', required=True, help="arquivo .grafo a gravar")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    grafo = importar(args.entrada)
+    grafo.salvar(args.saida)
+    compacto = grafo.como_compacto()
+    print(f"{len(compacto)} locais, {len(compacto.destinos) // 2} ruas em "
+          f"{time.perf_counter() - inicio:.1f} s -> {args.saida}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+import math
+from array import array
+
+
+def _numpy():
+    # numpy é opcional e só é importado na primeira consulta em lote.
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+class IndiceEspacial:
+    # Grade uniforme sobre as posições dos locais, para achar o nó mais
+    # próximo de uma coordenada qualquer (ex.: onde a ocorrência foi
+    # registrada) sem percorrer a cidade toda. O tamanho da célula é escolhido
+    # para ter em média `ocupacao` nós por célula; a busca olha a célula do
+    # ponto e vai abrindo anéis em volta só até ter certeza de que nenhum nó
+    # mais distante poderia ser mais próximo.
+    #
+    # Os nós ficam ordenados por célula, em arrays no mesmo estilo do CSR:
+    # os da célula c estão em ordem[inicios[c]:inicios[c + 1]].
+    def __init__(self, nomes, xs, ys, ocupacao=2):
+        self.nomes = nomes
+        pontos = [i for i in range(len(nomes)) if not (math.isnan(xs[i]) or math.isnan(ys[i]))]
+        self._n = len(pontos)
+        if not pontos:
+            self.ordem = array('q')
+            return
+
+        x0, x1 = min(xs[i] for i in pontos), max(xs[i] for i in pontos)
+        y0, y1 = min(ys[i] for i in pontos), max(ys[i] for i in pontos)
+        largura, altura = x1 - x0, y1 - y0
+        # A segunda opção cobre pontos alinhados (área zero).
+        celula = max(math.sqrt(largura * altura * ocupacao / len(pontos)),
+                     max(largura, altura) * ocupacao / len(pontos))
+        self.celula = celula or 1.0
+        self.origem = (x0, y0)
+        self.colunas = int(largura / self.celula) + 1
+        self.linhas = int(altura / self.celula) + 1
+
+        chaves = [self._chave(*self._celula_de(xs[i], ys[i])) for i in pontos]
+        inicios = array('q', bytes(8 * (self.colunas * self.linhas + 1)))
+        for chave in chaves:
+            inicios[chave + 1] += 1
+        for c in range(len(inicios) - 1):
+            inicios[c + 1] += inicios[c]
+
+        proximo = inicios[:-1]
+        ordem = array('q', bytes(8 * len(pontos)))
+        for i, chave in zip(pontos, chaves):
+            ordem[proximo[chave]] = i
+            proximo[chave] += 1
+
+        self.inicios = inicios
+        self.ordem = ordem
+        self.xs = array('d', (xs[i] for i in ordem))
+        self.ys = array('d', (ys[i] for i in ordem))
+        self._arrays_numpy = None
+
+    @classmethod
+    def de_grafo(cls, grafo, ocupacao=2):
+        if grafo.compilado:
+            g = grafo.como_compacto()
+            if g.xs is None:
+                return cls([], [], [], ocupacao)
+            return cls(g.nomes, g.xs, g.ys, ocupacao)
+        nomes = list(grafo.posicoes)
+        return cls(nomes, [grafo.posicoes[nome][0] for nome in nomes],
+                   [grafo.posicoes[nome][1] for nome in nomes], ocupacao)
+
+    def __len__(self):
+        return self._n
+
+    def _celula_de(self, x, y):
+        # Coluna e linha da célula que contém (x, y), limitadas à grade.
+        coluna = int((x - self.origem[0]) / self.celula)
+        linha = int((y - self.origem[1]) / self.celula)
+        return min(max(coluna, 0), self.colunas - 1), min(max(linha, 0), self.linhas - 1)
+
+    def _chave(self, coluna, linha):
+        return coluna * self.linhas + linha
+
+    def _anel(self, coluna, linha, raio):
+        # Células a distância (Chebyshev) exatamente `raio`, dentro da grade.
+        if raio == 0:
+            if 0 <= coluna < self.colunas and 0 <= linha < self.linhas:
+                yield self._chave(coluna, linha)
+            return
+        primeira, ultima = max(coluna - raio, 0), min(coluna + raio, self.colunas - 1)
+        for j in (linha - raio, linha + raio):
+            if 0 <= j < self.linhas:
+                for i in range(primeira, ultima + 1):
+                    yield self._chave(i, j)
+        primeira, ultima = max(linha - raio + 1, 0), min(linha + raio - 1, self.linhas - 1)
+        for i in (coluna - raio, coluna + raio):
+            if 0 <= i < self.colunas:
+                for j in range(primeira, ultima + 1):
+                    yield self._chave(i, j)
+
+    def _busca(self, x, y):
+        # Posição (em `ordem`) do nó mais próximo e o quadrado da distância.
+        if not self._n:
+            raise ValueError("Nenhum local do grafo tem posição.")
+        # Célula do ponto sem limitar à grade: para pontos fora dela, os anéis
+        # começam já na distância em que alcançam a grade.
+        coluna = math.floor((x - self.origem[0]) / self.celula)
+        linha = math.floor((y - self.origem[1]) / self.celula)
+        raio = max(0, -coluna, coluna - (self.colunas - 1), -linha, linha - (self.linhas - 1))
+        ultimo_raio = max(coluna, self.colunas - 1 - coluna, linha, self.linhas - 1 - linha)
+
+        inicios, xs, ys = self.inicios, self.xs, self.ys
+        melhor, melhor_d2 = -1, math.inf
+        while raio <= ultimo_raio:
+            for chave in self._anel(coluna, linha, raio):
+                for k in range(inicios[chave], inicios[chave + 1]):
+                    d2 = (xs[k] - x) ** 2 + (ys[k] - y) ** 2
+                    if d2 < melhor_d2:
+                        melhor, melhor_d2 = k, d2
+            # Qualquer nó nos anéis seguintes está a pelo menos raio * celula.
+            if melhor >= 0 and melhor_d2 <= (raio * self.celula) ** 2:
+                break
+            raio += 1
+        return melhor, melhor_d2
+
+    def mais_proximo(self, x, y):
+        # (nome, distância) do local mais próximo de (x, y).
+        k, d2 = self._busca(x, y)
+        return self.nomes[self.ordem[k]], math.sqrt(d2)
+
+    def mais_proximos(self, xs, ys):
+        # Versão em lote: lista de (nome, distância), um por ponto. Com numpy
+        # instalado, a vizinhança imediata de todos os pontos é examinada de
+        # uma vez; só os pontos em regiões vazias caem na busca por anéis.
+        np = _numpy()
+        if np is None or not self._n:
+            return [self.mais_proximo(x, y) for x, y in zip(xs, ys)]
+
+        ks, d2s = self._lote_numpy(np, np.asarray(xs, dtype=float), np.asarray(ys, dtype=float))
+        resultado = []
+        for x, y, k, d2 in zip(xs, ys, ks.tolist(), d2s.tolist()):
+            if k < 0 or d2 > self.celula ** 2:
+                k, d2 = self._busca(x, y)
+            resultado.append((self.nomes[self.ordem[k]], math.sqrt(d2)))
+        return resultado
+
+    def _lote_numpy(self, np, qx, qy):
+        if self._arrays_numpy is None:
+            self._arrays_numpy = (np.frombuffer(self.inicios, dtype=np.int64),
+                                  np.frombuffer(self.xs, dtype=float),
+                                  np.frombuffer(self.ys, dtype=float))
+        inicios, xs, ys = self._arrays_numpy
+        ocupacao_maxima = int(np.diff(inicios).max())
+
+        coluna = np.floor((qx - self.origem[0]) / self.celula).astype(np.int64)
+        linha = np.floor((qy - self.origem[1]) / self.celula).astype(np.int64)
+        melhor = np.full(len(qx), -1, dtype=np.int64)
+        melhor_d2 = np.full(len(qx), np.inf)
+
+        # Células vizinhas (3 x 3). Depois delas, um nó não visto está a pelo
+        # menos uma célula de distância, então quem já achou algo mais perto
+        # que isso tem a resposta exata.
+        for dc in (-1, 0, 1):
+            for dl in (-1, 0, 1):
+                i, j = coluna + dc, linha + dl
+                dentro = (i >= 0) & (i < self.colunas) & (j >= 0) & (j < self.linhas)
+                chave = np.where(dentro, i * self.linhas + j, 0)
+                a = inicios[chave]
+                b = np.where(dentro, inicios[chave + 1], a)
+                for deslocamento in range(ocupacao_maxima):
+                    k = a + deslocamento
+                    existe = k < b
+                    if not existe.any():
+                        break
+                    k = np.where(existe, k, 0)
+                    d2 = np.where(existe, (xs[k] - qx) ** 2 + (ys[k] - qy) ** 2, np.inf)
+                    menor = d2 < melhor_d2
+                    melhor = np.where(menor, k, melhor)
+                    melhor_d2 = np.where(menor, d2, melhor_d2)
+        return melhor, melhor_d2
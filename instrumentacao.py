@@ -0,0 +1,165 @@
+import json
+import marshal
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+
+
+# Instrumentação dos caminhos quentes do despacho: tempo por etapa (busca,
+# reconstrução do caminho, montagem da tabela, quadros da animação) e
+# contadores das buscas (nós fixados, entradas inseridas e retiradas da
+# fila de prioridade, entradas vencidas descartadas).
+#
+# Desligada por padrão. Desligada, uma etapa custa uma chamada que devolve
+# um contexto vazio e uma busca só conta em variáveis locais do próprio
+# laço, repassadas aqui no fim se `ativo` for verdadeiro. Liga com ativar()
+# ou com a variável de ambiente RESGATE_INSTRUMENTACAO=1.
+#
+# O relatório sai em JSON ou no formato do cProfile (marshal de pstats),
+# com cada etapa como uma "função" e as etapas aninhadas como chamadas: dá
+# para abrir com `python -m pstats arquivo.pstats` ou com o snakeviz.
+
+ativo = os.environ.get('RESGATE_INSTRUMENTACAO', '') not in ('', '0')
+
+_trava = threading.Lock()
+_local = threading.local()
+# nome -> [chamadas, total, próprio (sem as etapas internas), máximo]
+_etapas = {}
+# (etapa externa, etapa interna) -> [chamadas, total, próprio]
+_chamadas = {}
+_contadores = defaultdict(int)
+_NADA = nullcontext()
+
+
+def ativar():
+    global ativo
+    ativo = True
+
+
+def desativar():
+    global ativo
+    ativo = False
+
+
+def zerar():
+    with _trava:
+        _etapas.clear()
+        _chamadas.clear()
+        _contadores.clear()
+
+
+class _Etapa:
+    __slots__ = ('nome', 'inicio', 'internas')
+
+    def __init__(self, nome):
+        self.nome = nome
+
+    def __enter__(self):
+        pilha = getattr(_local, 'pilha', None)
+        if pilha is None:
+            pilha = _local.pilha = []
+        pilha.append(self)
+        self.internas = 0.0
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *excecao):
+        duracao = time.perf_counter() - self.inicio
+        proprio = duracao - self.internas
+        pilha = _local.pilha
+        pilha.pop()
+        externa = pilha[-1] if pilha else None
+        if externa is not None:
+            externa.internas += duracao
+        with _trava:
+            registro = _etapas.get(self.nome)
+            if registro is None:
+                registro = _etapas[self.nome] = [0, 0.0, 0.0, 0.0]
+            registro[0] += 1
+            registro[1] += duracao
+            registro[2] += proprio
+            registro[3] = max(registro[3], duracao)
+            chave = (externa.nome if externa is not None else None, self.nome)
+            chamada = _chamadas.get(chave)
+            if chamada is None:
+                chamada = _chamadas[chave] = [0, 0.0, 0.0]
+            chamada[0] += 1
+            chamada[1] += duracao
+            chamada[2] += proprio
+        return False
+
+
+def etapa(nome):
+    # Uso: `with instrumentacao.etapa('grafo.dijkstra'): ...`
+    if not ativo:
+        return _NADA
+    return _Etapa(nome)
+
+
+def busca(nome, retiradas, descartadas, restantes):
+    # Fim de uma busca com fila de prioridade: `retiradas` entradas saíram
+    # da fila, `descartadas` delas vencidas (o nó já tinha distância menor),
+    # e `restantes` ficaram na fila quando a busca parou. Toda entrada
+    # inserida foi retirada ou ficou, e cada retirada não descartada fixa um
+    # nó.
+    if ativo:
+        with _trava:
+            _contadores[f'{nome}.buscas'] += 1
+            _contadores[f'{nome}.nos_fixados'] += retiradas - descartadas
+            _contadores[f'{nome}.inseridas'] += retiradas + restantes
+            _contadores[f'{nome}.retiradas'] += retiradas
+            _contadores[f'{nome}.descartadas'] += descartadas
+
+
+def relatorio():
+    with _trava:
+        etapas = {
+            nome: {'chamadas': chamadas, 'total_s': total, 'proprio_s': proprio,
+                   'media_ms': total / chamadas * 1e3, 'maximo_ms': maximo * 1e3}
+            for nome, (chamadas, total, proprio, maximo) in sorted(_etapas.items())
+        }
+        return {'etapas': etapas, 'contadores': dict(sorted(_contadores.items()))}
+
+
+def exportar_json(caminho):
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        json.dump(relatorio(), arquivo, ensure_ascii=False, indent=2)
+
+
+def _funcao(nome):
+    # Chave de "função" do pstats: (arquivo, linha, nome).
+    return ('instrumentacao', 0, nome)
+
+
+def estatisticas_pstats():
+    # O dicionário que o pstats.Stats lê de um arquivo do cProfile:
+    # função -> (chamadas primitivas, chamadas, tempo próprio, tempo
+    # acumulado, {chamadora: (chamadas, chamadas primitivas, próprio,
+    # acumulado)}).
+    with _trava:
+        chamadoras = defaultdict(dict)
+        for (externa, interna), (chamadas, total, proprio) in _chamadas.items():
+            if externa is not None:
+                chamadoras[interna][_funcao(externa)] = (chamadas, chamadas, proprio, total)
+        return {
+            _funcao(nome): (chamadas, chamadas, proprio, total, chamadoras[nome])
+            for nome, (chamadas, total, proprio, _) in _etapas.items()
+        }
+
+
+def exportar_pstats(caminho):
+    # O pstats.Stats recusa um arquivo sem nenhuma função.
+    if not _etapas:
+        raise ValueError("Nenhuma etapa registrada: a instrumentação estava ligada?")
+    with open(caminho, 'wb') as arquivo:
+        marshal.dump(estatisticas_pstats(), arquivo)
+
+
+def exportar(caminho):
+    # Pela extensão: .pstats ou .prof no formato do cProfile, o resto em JSON.
+    if caminho.endswith(('.pstats', '.prof')):
+        exportar_pstats(caminho)
+    else:
+        exportar_json(caminho)
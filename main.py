@@ -1,209 +1,168 @@
-import heapq
-import random
-import networkx as nx
-import matplotlib.pyplot as plt
-import matplotlib.animation as animation
-import matplotlib.patches as mpatches
+import argparse
+import os
+import queue
+import sys
 import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
 from tkinter import ttk, messagebox
 
-class Grafo:
-    def __init__(self):
-        self.adjacencias = {}
-
-    def adicionar_vertice(self, nome):
-        if nome not in self.adjacencias:
-            self.adjacencias[nome] = []
-
-    def adicionar_aresta(self, origem, destino, peso):
-        self.adjacencias[origem].append((destino, peso))
-        self.adjacencias[destino].append((origem, peso))
-
-    def dijkstra(self, inicio):
-        distancias = {no: float('inf') for no in self.adjacencias}
-        distancias[inicio] = 0
-        anteriores = {no: None for no in self.adjacencias}
-        fila = [(0, inicio)]
-
-        while fila:
-            distancia_atual, no_atual = heapq.heappop(fila)
-            if distancia_atual > distancias[no_atual]:
-                continue
-
-            for vizinho, peso in self.adjacencias[no_atual]:
-                nova_distancia = distancia_atual + peso
-                if nova_distancia < distancias[vizinho]:
-                    distancias[vizinho] = nova_distancia
-                    anteriores[vizinho] = no_atual
-                    heapq.heappush(fila, (nova_distancia, vizinho))
-
-        return distancias, anteriores
-
-    def reconstruir_caminho(self, anteriores, destino):
-        caminho = []
-        while destino:
-            caminho.insert(0, destino)
-            destino = anteriores[destino]
-        return caminho
-
-    def animar_rota(self, ambulancia, hospitais, caminho, tempo_total):
-        G = nx.Graph()
-        for origem, vizinhos in self.adjacencias.items():
-            for destino, peso in vizinhos:
-                if not G.has_edge(origem, destino):
-                    G.add_edge(origem, destino, weight=peso)
-
-        pos = {
-            'Praça Orlando de Barros Pimentel': (0.55, 0.64),
-            'RJ-106 (Rodovia Amaral Peixoto)': (3.50, 1.75),
-            'Rua Abreu Rangel': (0.34, -0.83),
-            'Hospital Conde Modesto Leal': (5.30, 1.40),
-            'Av. Roberto Silveira': (3.50, 0.24),
-            'UPA de Inoã': (1.50, -1.70)
-        }
-
-        pesos = nx.get_edge_attributes(G, 'weight')
-
-        fig, ax = plt.subplots(figsize=(10, 8))
-        fig.subplots_adjust(bottom=0.25)
-
-        try:
-            imagem_mapa = plt.imread("mapa_marica.png")
-        except FileNotFoundError:
-            messagebox.showerror("Erro", "Arquivo 'mapa_marica.png' não encontrado. Coloque a imagem na mesma pasta do script.")
+import instrumentacao
+import marica
+from arvores import TabelaHospitais
+from grafo import Grafo
+
+
+# Na abertura só é carregado o necessário para a janela: o tkinter e o
+# grafo. O grafo vem pronto de um arquivo .grafo quando existe (aberto via
+# mmap, sem reconstrução); a tabela de rotas dos hospitais é montada no
+# primeiro envio, e o matplotlib só é importado quando a animação é exibida
+# (visualizacao.JanelaFrota).
+#
+# Nada bloqueia o laço de eventos: as rotas são calculadas numa thread à
+# parte (uma só, que é a única a usar o grafo e seus caches) e a resposta
+# volta para a thread do Tk por uma fila, consultada com after(). Cada rota
+# pronta entra no mapa de acompanhamento da frota, uma janela só para todas
+# as ambulâncias em rota, também movida por after(); o próximo despacho pode
+# ser feito enquanto as anteriores estão a caminho.
+
+# Milissegundos entre as consultas à fila de rotas prontas.
+INTERVALO_RESPOSTAS = 50
+
+
+def carregar_grafo(caminho=None):
+    # Sem arquivo, usa marica.grafo se ele existir; senão constrói o grafo de
+    # Maricá com pesos sorteados, como antes.
+    if caminho is None and os.path.exists(marica.ARQUIVO_GRAFO):
+        caminho = marica.ARQUIVO_GRAFO
+    if caminho is None:
+        return marica.construir_grafo()
+    return Grafo.carregar(caminho)
+
+
+class Aplicacao:
+    def __init__(self, root, grafo, hospitais):
+        self.root = root
+        self.grafo = grafo
+        self.hospitais = list(hospitais)
+        self._tabela_hospitais = None
+        self._calculos = ThreadPoolExecutor(max_workers=1)
+        self._prontas = queue.Queue()
+        self.frota = None
+
+        root.title("Sistema de Ambulância - Maricá")
+        root.geometry("500x420")
+
+        ttk.Label(root, text="Selecione o hospital de origem:").pack(pady=5)
+        self.combobox_hospital = ttk.Combobox(root, values=self.hospitais, state="readonly")
+        self.combobox_hospital.pack(pady=5)
+
+        ttk.Label(root, text="Selecione o local da ocorrência:").pack(pady=5)
+        eh_hospital = set(self.hospitais)
+        locais_ocorrencia = [l for l in grafo.adjacencias if l not in eh_hospital]
+        self.combobox_ocorrencia = ttk.Combobox(root, values=locais_ocorrencia, state="readonly")
+        self.combobox_ocorrencia.pack(pady=5)
+
+        btn = ttk.Button(root, text="Enviar Ambulância", command=self.enviar_ambulancia)
+        btn.pack(pady=20)
+
+        self.lista_despachos = tk.Listbox(root, height=6)
+        self.lista_despachos.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+
+        root.protocol("WM_DELETE_WINDOW", self.fechar)
+        root.after(INTERVALO_RESPOSTAS, self._receber_rotas)
+
+    @property
+    def tabela_hospitais(self):
+        if self._tabela_hospitais is None:
+            self._tabela_hospitais = TabelaHospitais(self.grafo, self.hospitais)
+        return self._tabela_hospitais
+
+    def enviar_ambulancia(self):
+        hospital = self.combobox_hospital.get()
+        destino = self.combobox_ocorrencia.get()
+
+        if not hospital or not destino:
+            messagebox.showwarning("Atenção", "Selecione o hospital de origem e o local da ocorrência.")
             return
 
-        extensao = [-1, 7, -3, 3]
-
-        def desenhar_mapa():
-            ax.clear()
-            ax.imshow(imagem_mapa, extent=extensao, aspect='auto', zorder=0)
-            cor_nos = []
-            for no in G.nodes():
-                if no == ambulancia:
-                    cor_nos.append('yellow')
-                elif no in hospitais:
-                    cor_nos.append('green')
-                else:
-                    cor_nos.append('lightblue')
-
-            nx.draw(G, pos, with_labels=True, node_color=cor_nos, node_size=800, ax=ax)
-            nx.draw_networkx_edge_labels(G, pos, edge_labels=pesos, ax=ax)
-            nx.draw_networkx_edges(G, pos, ax=ax)
-
-        for i in range(3, 0, -1):
-            ax.clear()
-            ax.text(0.5, 0.5, str(i), transform=ax.transAxes,
-                    fontsize=50, ha='center', va='center', color='red')
-            plt.pause(1)
-
-        def atualizar(frame):
-            desenhar_mapa()
-
-            if frame > 0:
-                subcaminho = [(caminho[i], caminho[i+1]) for i in range(frame) if i+1 < len(caminho)]
-                nx.draw_networkx_edges(G, pos, edgelist=subcaminho, edge_color='red', width=3, ax=ax)
-
-            if frame < len(caminho):
-                ponto = caminho[frame]
-                x, y = pos[ponto]
-                circulo_externo = mpatches.Circle((x, y), 0.1, color='red', zorder=10)
-                ax.add_patch(circulo_externo)
-
-            info_linha1 = f"Local atual: {caminho[frame] if frame < len(caminho) else caminho[-1]}"
-            info_linha2 = f"Tempo estimado: {tempo_total} minutos"
-            info_linha3 = f"Caminho restante: {' → '.join(caminho[frame:]) if frame < len(caminho) else 'Chegou ao destino'}"
-
-            ax.text(0.5, 1.08, info_linha1, transform=ax.transAxes,
-                    fontsize=12, ha='center', va='top', bbox=dict(facecolor='white', alpha=0.8))
-            ax.text(0.5, 1.01, info_linha2, transform=ax.transAxes,
-                    fontsize=12, ha='center', va='top', bbox=dict(facecolor='white', alpha=0.8))
-            ax.text(0.5, 0.94, info_linha3, transform=ax.transAxes,
-                    fontsize=11, ha='center', va='top', bbox=dict(facecolor='white', alpha=0.8))
-
-        ani = animation.FuncAnimation(fig, atualizar, frames=len(caminho), interval=2100, repeat=False)
-        plt.show()
-
-
-def peso_aleatorio():
-    return random.randint(1, 10)
-
-
-# Construção do grafo
-
-grafo = Grafo()
-locais = [
-    'Praça Orlando de Barros Pimentel',
-    'RJ-106 (Rodovia Amaral Peixoto)',
-    'Rua Abreu Rangel',
-    'Hospital Conde Modesto Leal',
-    'Av. Roberto Silveira',
-    'UPA de Inoã'
-]
-
-for local in locais:
-    grafo.adicionar_vertice(local)
-
-grafo.adicionar_aresta('Praça Orlando de Barros Pimentel', 'RJ-106 (Rodovia Amaral Peixoto)', peso_aleatorio())
-grafo.adicionar_aresta('Praça Orlando de Barros Pimentel', 'Rua Abreu Rangel', peso_aleatorio())
-grafo.adicionar_aresta('RJ-106 (Rodovia Amaral Peixoto)', 'Rua Abreu Rangel', peso_aleatorio())
-grafo.adicionar_aresta('RJ-106 (Rodovia Amaral Peixoto)', 'Hospital Conde Modesto Leal', peso_aleatorio())
-grafo.adicionar_aresta('Rua Abreu Rangel', 'Hospital Conde Modesto Leal', peso_aleatorio())
-grafo.adicionar_aresta('Rua Abreu Rangel', 'Av. Roberto Silveira', peso_aleatorio())
-grafo.adicionar_aresta('Hospital Conde Modesto Leal', 'Av. Roberto Silveira', peso_aleatorio())
-grafo.adicionar_aresta('Av. Roberto Silveira', 'UPA de Inoã', peso_aleatorio())
-
-# Interface Tkinter
-
-hospitais = ['Hospital Conde Modesto Leal', 'UPA de Inoã']
-
-root = tk.Tk()
-root.title("Sistema de Ambulância - Maricá")
-root.geometry("500x300")
-
-ttk.Label(root, text="Selecione o hospital de origem:").pack(pady=5)
-combobox_hospital = ttk.Combobox(root, values=hospitais, state="readonly")
-combobox_hospital.pack(pady=5)
-
-ttk.Label(root, text="Selecione o local da ocorrência:").pack(pady=5)
-locais_ocorrencia = [l for l in locais if l not in hospitais]
-combobox_ocorrencia = ttk.Combobox(root, values=locais_ocorrencia, state="readonly")
-combobox_ocorrencia.pack(pady=5)
-
-def enviar_ambulancia():
-    hospital = combobox_hospital.get()
-    destino = combobox_ocorrencia.get()
-
-    if not hospital or not destino:
-        messagebox.showwarning("Atenção", "Selecione o hospital de origem e o local da ocorrência.")
-        return
-
-    if hospital == destino:
-        messagebox.showerror("Erro", "O hospital e o local da ocorrência devem ser diferentes.")
-        return
-
-    _, anteriores_ida = grafo.dijkstra(hospital)
-    caminho_ida = grafo.reconstruir_caminho(anteriores_ida, destino)
-    tempo_ida = sum(peso for u, v in zip(caminho_ida, caminho_ida[1:]) 
-                    for w, peso in grafo.adjacencias[u] if w == v)
-
-    _, anteriores_volta = grafo.dijkstra(destino)
-    caminho_volta = grafo.reconstruir_caminho(anteriores_volta, hospital)
-    tempo_volta = sum(peso for u, v in zip(caminho_volta, caminho_volta[1:]) 
-                      for w, peso in grafo.adjacencias[u] if w == v)
-
-    caminho_total = caminho_ida + caminho_volta[1:]
-    tempo_total = tempo_ida + tempo_volta
-
-    rota_str = " -> ".join(caminho_total)
-    messagebox.showinfo("Rota Calculada",
-                        f"Hospital: {hospital}\nOcorrência: {destino}\n"
-                        f"Tempo ida: {tempo_ida} min\nTempo volta: {tempo_volta} min\n"
-                        f"Tempo total: {tempo_total} min\nRota: {rota_str}")
-
-    grafo.animar_rota(hospital, hospitais, caminho_total, tempo_total)
+        if hospital == destino:
+            messagebox.showerror("Erro", "O hospital e o local da ocorrência devem ser diferentes.")
+            return
 
-btn = ttk.Button(root, text="Enviar Ambulância", command=enviar_ambulancia)
-btn.pack(pady=20)
+        indice = self.lista_despachos.size()
+        self.lista_despachos.insert(tk.END, f"{hospital} → {destino}: calculando...")
+        futuro = self._calculos.submit(self._calcular_rota, hospital, destino)
+        futuro.add_done_callback(lambda futuro: self._prontas.put((indice, hospital, destino, futuro)))
+
+    def _calcular_rota(self, hospital, destino):
+        # Roda na thread de cálculo; a primeira chamada monta a tabela.
+        with instrumentacao.etapa('console.calcular_rota'):
+            return self.tabela_hospitais.rota(hospital, destino)
+
+    def _receber_rotas(self):
+        while True:
+            try:
+                indice, hospital, destino, futuro = self._prontas.get_nowait()
+            except queue.Empty:
+                break
+            self._mostrar_rota(indice, hospital, destino, futuro)
+        self.root.after(INTERVALO_RESPOSTAS, self._receber_rotas)
+
+    def _mostrar_rota(self, indice, hospital, destino, futuro):
+        self.lista_despachos.delete(indice)
+        erro = futuro.exception()
+        if erro is not None:
+            self.lista_despachos.insert(indice, f"{hospital} → {destino}: erro")
+            messagebox.showerror("Erro", f"Não foi possível calcular a rota: {erro}")
+            return
 
-root.mainloop()
+        tempo_ida, caminho_ida, tempo_volta, caminho_volta = futuro.result()
+        if tempo_ida == float('inf') or tempo_volta == float('inf'):
+            self.lista_despachos.insert(indice, f"{hospital} → {destino}: sem rota")
+            messagebox.showwarning("Aviso", "Não há caminho entre o hospital e a ocorrência.")
+            return
+        caminho_total = caminho_ida + caminho_volta[1:]
+        tempo_total = tempo_ida + tempo_volta
+        self.lista_despachos.insert(indice, f"{hospital} → {destino}: ida {tempo_ida} min, "
+                                            f"volta {tempo_volta} min, total {tempo_total} min; "
+                                            f"rota: {' -> '.join(caminho_total)}")
+
+        if self.frota is None or not self.frota.janela.winfo_exists():
+            from visualizacao import JanelaFrota
+            try:
+                self.frota = JanelaFrota(self.root, self.grafo, self.hospitais)
+            except FileNotFoundError:
+                messagebox.showerror("Erro", "Arquivo 'mapa_marica.png' não encontrado. Coloque a imagem na mesma pasta do script.")
+                return
+        self.frota.adicionar(caminho_total)
+
+    def fechar(self):
+        self._calculos.shutdown(wait=False, cancel_futures=True)
+        self.root.destroy()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Console de despacho de ambulâncias.")
+    parser.add_argument('-g', '--grafo',
+                        help=f"grafo pré-compilado (.grafo); padrão: {marica.ARQUIVO_GRAFO}, se existir")
+    parser.add_argument('--hospitais', nargs='+', default=marica.hospitais)
+    parser.add_argument('--instrumentacao', metavar='ARQUIVO',
+                        help="mede as etapas do despacho e grava o relatório ao fechar (.json, ou .pstats)")
+    args = parser.parse_args(argv)
+    if args.instrumentacao:
+        instrumentacao.ativar()
+
+    root = tk.Tk()
+    Aplicacao(root, carregar_grafo(args.grafo), args.hospitais)
+    try:
+        root.mainloop()
+    finally:
+        if args.instrumentacao:
+            try:
+                instrumentacao.exportar(args.instrumentacao)
+            except ValueError as erro:
+                print(f"relatório de instrumentação não gravado: {erro}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+import argparse
+import random
+
+from grafo import Grafo
+
+
+locais = {
+    'Praça Orlando de Barros Pimentel': (0.55, 0.64),
+    'RJ-106 (Rodovia Amaral Peixoto)': (3.50, 1.75),
+    'Rua Abreu Rangel': (0.34, -0.83),
+    'Hospital Conde Modesto Leal': (5.30, 1.40),
+    'Av. Roberto Silveira': (3.50, 0.24),
+    'UPA de Inoã': (1.50, -1.70)
+}
+
+ruas = [
+    ('Praça Orlando de Barros Pimentel', 'RJ-106 (Rodovia Amaral Peixoto)'),
+    ('Praça Orlando de Barros Pimentel', 'Rua Abreu Rangel'),
+    ('RJ-106 (Rodovia Amaral Peixoto)', 'Rua Abreu Rangel'),
+    ('RJ-106 (Rodovia Amaral Peixoto)', 'Hospital Conde Modesto Leal'),
+    ('Rua Abreu Rangel', 'Hospital Conde Modesto Leal'),
+    ('Rua Abreu Rangel', 'Av. Roberto Silveira'),
+    ('Hospital Conde Modesto Leal', 'Av. Roberto Silveira'),
+    ('Av. Roberto Silveira', 'UPA de Inoã'),
+]
+
+hospitais = ['Hospital Conde Modesto Leal', 'UPA de Inoã']
+
+# Grafo pré-compilado que o main.py abre, se existir (gerado por este módulo).
+ARQUIVO_GRAFO = "marica.grafo"
+
+# Fator sobre o tempo normal ao longo do dia (minutos desde a meia-noite):
+# a RJ-106 fica bem mais lenta nos horários de pico.
+pico_rodovia = ([360, 450, 570, 990, 1080, 1200], [1.0, 2.5, 1.0, 1.0, 2.0, 1.0])
+perfis = {rua: pico_rodovia for rua in ruas if 'RJ-106 (Rodovia Amaral Peixoto)' in rua}
+
+
+def peso_aleatorio():
+    return random.randint(1, 10)
+
+
+def construir_grafo(peso=peso_aleatorio):
+    grafo = Grafo()
+    for local, posicao in locais.items():
+        grafo.adicionar_vertice(local, posicao)
+    for origem, destino in ruas:
+        grafo.adicionar_aresta(origem, destino, peso())
+    grafo.compilar()
+    for (origem, destino), (instantes, fatores) in perfis.items():
+        grafo.definir_perfil(origem, destino, instantes, fatores)
+    return grafo
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Grava o grafo de Maricá pré-compilado, com os pesos sorteados agora, para o main.py.")
+    parser.add_argument('-o', '--saida', default=ARQUIVO_GRAFO)
+    args = parser.parse_args(argv)
+    construir_grafo().salvar(args.saida)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+from arvores import TabelaHospitais
+from grafo import Grafo
+from importador import importar
+import instrumentacao
+import marica
+
+
+# Motor de despacho sem interface gráfica: carrega um grafo, lê pedidos
+# (hospital, ocorrência) de CSV ou JSONL e calcula ida e volta como o
+# enviar_ambulancia do main.py, gravando cada resultado assim que fica
+# pronto. Tudo é feito em fluxo, então a memória não cresce com o número
+# de pedidos.
+
+
+def _formato(caminho, formato=None):
+    if formato:
+        return formato
+    if caminho.endswith('.csv'):
+        return 'csv'
+    return 'jsonl'
+
+
+def _abrir_entrada(caminho):
+    if caminho == '-':
+        return sys.stdin
+    return open(caminho, encoding='utf-8', newline='')
+
+
+def _ler_registros(caminho, formato=None):
+    arquivo = _abrir_entrada(caminho)
+    try:
+        if _formato(caminho, formato) == 'csv':
+            yield from csv.DictReader(arquivo)
+        else:
+            for linha in arquivo:
+                if linha.strip():
+                    yield json.loads(linha)
+    finally:
+        if arquivo is not sys.stdin:
+            arquivo.close()
+
+
+def _numero(valor):
+    if isinstance(valor, str):
+        try:
+            return int(valor)
+        except ValueError:
+            return float(valor)
+    return valor
+
+
+def carregar_grafo(caminho=None, formato=None):
+    # Sem arquivo, usa o grafo de Maricá como o main.py: o marica.grafo, se
+    # existir (os mesmos pesos em todas as rodadas), senão um montado na hora,
+    # com pesos sorteados. Arquivos .grafo (Grafo.salvar) são mapeados
+    # direto, sem leitura linha a linha; listas de ruas em CSV (origem,
+    # destino, peso) ou JSONL e mapas OSM, também compactados em .gz/.bz2,
+    # passam pelo importador.py.
+    if caminho is None and os.path.exists(marica.ARQUIVO_GRAFO):
+        caminho = marica.ARQUIVO_GRAFO
+    if caminho is None:
+        return marica.construir_grafo()
+    if formato == 'binario' or (formato is None and caminho.endswith('.grafo')):
+        return Grafo.carregar(caminho)
+    return importar(caminho, formato)
+
+
+def ler_pedidos(caminho, formato=None):
+    # A ocorrência vem pelo nome do local ou por coordenadas: colunas x,y no
+    # CSV ou "posicao": [x, y] no JSONL. Coordenadas viram uma tupla (x, y),
+    # que o motor encaixa no local mais próximo do grafo.
+    for registro in _ler_registros(caminho, formato):
+        ocorrencia = registro.get('ocorrencia') or ''
+        if not ocorrencia:
+            x, y = registro.get('posicao') or (registro.get('x'), registro.get('y'))
+            if x not in (None, '') and y not in (None, ''):
+                ocorrencia = (float(x), float(y))
+        yield registro.get('hospital') or '', ocorrencia
+
+
+def ler_resultados(caminho, formato=None):
+    # Lê de volta o que escrever_resultados gravou (despachos já feitos), com
+    # o caminho como lista e os tempos como números, para reprocessá-los.
+    for registro in _ler_registros(caminho, formato):
+        registro = {campo: valor for campo, valor in registro.items() if valor not in (None, '')}
+        if isinstance(registro.get('caminho'), str):
+            registro['caminho'] = registro['caminho'].split(" -> ")
+        for campo in ('tempo_ida', 'tempo_volta', 'tempo_total'):
+            if campo in registro:
+                registro[campo] = _numero(registro[campo])
+        yield registro
+
+
+def validar_pedido(grafo, hospital, destino):
+    # Mensagem de erro do pedido, ou None se ele pode ser roteado.
+    if not hospital or not destino:
+        return "Informe o hospital de origem e o local da ocorrência."
+    if hospital == destino:
+        return "O hospital e o local da ocorrência devem ser diferentes."
+    if hospital not in grafo.adjacencias or destino not in grafo.adjacencias:
+        return "Local desconhecido no grafo."
+    return None
+
+
+def resultado_rota(hospital, destino, tempo_ida, caminho_ida, tempo_volta, caminho_volta):
+    if not caminho_ida or not caminho_volta:
+        return {'hospital': hospital, 'ocorrencia': destino,
+                'erro': "Não há caminho entre o hospital e a ocorrência."}
+    return {
+        'hospital': hospital,
+        'ocorrencia': destino,
+        'tempo_ida': tempo_ida,
+        'tempo_volta': tempo_volta,
+        'tempo_total': tempo_ida + tempo_volta,
+        'caminho': caminho_ida + caminho_volta[1:],
+    }
+
+
+class MotorDespacho:
+    # Com a lista de hospitais, as rotas saem da TabelaHospitais (consulta
+    # direta); sem ela, cada pedido faz duas buscas ponto a ponto.
+    def __init__(self, grafo, hospitais=None):
+        self.grafo = grafo
+        self.tabela = TabelaHospitais(grafo, hospitais) if hospitais else None
+
+    def rota(self, hospital, destino):
+        if isinstance(destino, tuple):
+            try:
+                destino = self.grafo.local_mais_proximo(destino)
+            except ValueError as erro:
+                return {'hospital': hospital, 'ocorrencia': destino, 'erro': str(erro)}
+        erro = validar_pedido(self.grafo, hospital, destino)
+        if erro:
+            return {'hospital': hospital, 'ocorrencia': destino, 'erro': erro}
+
+        if self.tabela is not None and hospital in self.tabela.arvores:
+            tempo_ida, caminho_ida, tempo_volta, caminho_volta = self.tabela.rota(hospital, destino)
+        else:
+            tempo_ida, caminho_ida = self.grafo.menor_caminho(hospital, destino)
+            tempo_volta, caminho_volta = self.grafo.menor_caminho(destino, hospital)
+        return resultado_rota(hospital, destino, tempo_ida, caminho_ida, tempo_volta, caminho_volta)
+
+    def processar(self, pedidos):
+        for hospital, destino in pedidos:
+            yield self.rota(hospital, destino)
+
+
+class _EscritorCSV:
+    campos = ['hospital', 'ocorrencia', 'tempo_ida', 'tempo_volta', 'tempo_total', 'caminho', 'erro']
+
+    def __init__(self, arquivo):
+        self._escritor = csv.DictWriter(arquivo, fieldnames=self.campos)
+        self._escritor.writeheader()
+
+    def escrever(self, resultado):
+        linha = dict(resultado)
+        if 'caminho' in linha:
+            linha['caminho'] = " -> ".join(linha['caminho'])
+        self._escritor.writerow(linha)
+
+
+class _EscritorJSONL:
+    def __init__(self, arquivo):
+        self._arquivo = arquivo
+
+    def escrever(self, resultado):
+        self._arquivo.write(json.dumps(resultado, ensure_ascii=False))
+        self._arquivo.write('\n')
+
+
+def escrever_resultados(resultados, caminho='-', formato=None, progresso=0):
+    # Grava os resultados conforme chegam e devolve (quantidade, segundos).
+    arquivo = sys.stdout if caminho == '-' else open(caminho, 'w', encoding='utf-8', newline='')
+    escritor = (_EscritorCSV if _formato(caminho, formato) == 'csv' else _EscritorJSONL)(arquivo)
+    inicio = time.perf_counter()
+    quantidade = 0
+    try:
+        for resultado in resultados:
+            escritor.escrever(resultado)
+            quantidade += 1
+            if progresso and quantidade % progresso == 0:
+                decorrido = time.perf_counter() - inicio
+                print(f"{quantidade} pedidos ({quantidade / decorrido:,.0f}/s)", file=sys.stderr)
+    finally:
+        if arquivo is not sys.stdout:
+            arquivo.close()
+    return quantidade, time.perf_counter() - inicio
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calcula rotas de ambulância em lote, sem interface gráfica.")
+    parser.add_argument('pedidos', help="arquivo de pedidos (.csv com colunas hospital,ocorrencia ou .jsonl); '-' para stdin")
+    parser.add_argument('-g', '--grafo',
+                        help="grafo em .csv (origem,destino,peso), .jsonl, .osm ou .grafo (binário); padrão: marica.grafo, se existir, senão Maricá")
+    parser.add_argument('-o', '--saida', default='-', help="arquivo de saída (.csv ou .jsonl); padrão: stdout")
+    parser.add_argument('--formato-pedidos', choices=['csv', 'jsonl'])
+    parser.add_argument('--formato-saida', choices=['csv', 'jsonl'])
+    parser.add_argument('--hospitais', nargs='+',
+                        help="hospitais de origem; com eles as rotas saem de uma tabela pré-calculada")
+    parser.add_argument('--progresso', type=int, default=0, metavar='N',
+                        help="mostra a vazão a cada N pedidos")
+    parser.add_argument('-j', '--trabalhadores', type=int, default=1, metavar='N',
+                        help="processos que calculam rotas em paralelo sobre o grafo em memória compartilhada")
+    parser.add_argument('--instrumentacao', metavar='ARQUIVO',
+                        help="mede as etapas do cálculo e grava o relatório (.json, ou .pstats para o pstats); "
+                             "com -j, só o processo principal é medido")
+    args = parser.parse_args(argv)
+    if args.instrumentacao:
+        instrumentacao.ativar()
+
+    inicio = time.perf_counter()
+    grafo = carregar_grafo(args.grafo)
+    hospitais = args.hospitais or (marica.hospitais if args.grafo is None else None)
+    pedidos = ler_pedidos(args.pedidos, args.formato_pedidos)
+
+    if args.trabalhadores > 1:
+        from paralelo import ExecutorParalelo
+        executor = ExecutorParalelo(grafo, args.trabalhadores, hospitais=hospitais or [])
+        resultados = executor.rotas(pedidos)
+    else:
+        executor = None
+        resultados = MotorDespacho(grafo, hospitais).processar(pedidos)
+    preparo = time.perf_counter() - inicio
+
+    try:
+        quantidade, segundos = escrever_resultados(resultados, args.saida, args.formato_saida, args.progresso)
+    finally:
+        if executor is not None:
+            executor.fechar()
+
+    vazao = quantidade / segundos if segundos else 0
+    print(f"grafo carregado em {preparo:.2f} s; {quantidade} pedidos em {segundos:.2f} s "
+          f"({vazao:,.0f} pedidos/s)", file=sys.stderr)
+    cache = grafo.cache_rotas.estatisticas()
+    if cache['acertos'] or cache['falhas']:
+        print(f"cache de rotas: {cache['acertos']} acertos, {cache['falhas']} falhas, "
+              f"{cache['despejos']} despejos", file=sys.stderr)
+    if args.instrumentacao:
+        try:
+            instrumentacao.exportar(args.instrumentacao)
+        except ValueError as erro:
+            print(f"relatório de instrumentação não gravado: {erro}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
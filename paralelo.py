@@ -0,0 +1,126 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from multiprocessing import shared_memory
+
+from grafo import Grafo, GrafoCompacto
+
+
+# Consultas de rota em paralelo, em vários processos. O grafo compilado é
+# escrito uma única vez em memória compartilhada; cada processo trabalhador
+# monta seu Grafo por cima desse buffer, sem cópia e sem receber o grafo
+# serializado a cada tarefa. Só os pares de consulta e as respostas trafegam
+# entre os processos.
+
+_memoria = None
+_grafo = None
+_motor = None
+
+
+def _anexar(nome):
+    try:
+        return shared_memory.SharedMemory(name=nome, track=False)
+    except TypeError:
+        # Python < 3.13 não tem `track`. Os trabalhadores compartilham o
+        # resource_tracker do processo principal, então registrar o segmento
+        # de novo não tem efeito e o unlink continua sendo só do dono.
+        return shared_memory.SharedMemory(name=nome)
+
+
+def _iniciar_trabalhador(nome, hospitais):
+    global _memoria, _grafo, _motor
+    _memoria = _anexar(nome)
+    _grafo = Grafo.de_compacto(GrafoCompacto.de_buffer(_memoria.buf))
+    if hospitais is not None:
+        from motor import MotorDespacho
+        _motor = MotorDespacho(_grafo, hospitais)
+
+
+def _menores_caminhos(pares):
+    return [_grafo.menor_caminho(origem, destino) for origem, destino in pares]
+
+
+def _rotas(pedidos):
+    return [_motor.rota(hospital, destino) for hospital, destino in pedidos]
+
+
+def _aplicar(funcao, lote):
+    return funcao(_grafo, lote)
+
+
+class ExecutorParalelo:
+    # Uso:
+    #     with ExecutorParalelo(grafo, trabalhadores=4) as executor:
+    #         for tempo, caminho in executor.menores_caminhos(pares): ...
+    #
+    # As respostas saem na mesma ordem dos pedidos e são idênticas às do
+    # Grafo.menor_caminho em série. Apenas `trabalhadores * 2` lotes ficam
+    # em voo ao mesmo tempo, então a entrada pode ser um gerador enorme.
+    # O grafo é fotografado na criação: pesos alterados depois não chegam
+    # aos trabalhadores.
+    def __init__(self, grafo, trabalhadores=None, tamanho_lote=256, hospitais=None):
+        compacto = grafo.como_compacto()
+        self.trabalhadores = trabalhadores or os.cpu_count() or 1
+        self.tamanho_lote = tamanho_lote
+
+        self._memoria = shared_memory.SharedMemory(create=True, size=max(1, compacto.tamanho_binario()))
+        try:
+            compacto.escrever_binario(self._memoria.buf)
+            # Com hospitais, cada trabalhador monta seu MotorDespacho (e a
+            # TabelaHospitais dele) e responde pedidos completos de ida e volta.
+            self._processos = ProcessPoolExecutor(
+                max_workers=self.trabalhadores,
+                initializer=_iniciar_trabalhador,
+                initargs=(self._memoria.name, hospitais))
+        except BaseException:
+            self._liberar_memoria()
+            raise
+        self._com_motor = hospitais is not None
+
+    def _distribuir(self, funcao, itens, *argumentos, tamanho_lote=None):
+        itens = iter(itens)
+        pendentes = deque()
+        limite = 2 * self.trabalhadores
+        tamanho_lote = tamanho_lote or self.tamanho_lote
+
+        while True:
+            while len(pendentes) < limite:
+                lote = list(islice(itens, tamanho_lote))
+                if not lote:
+                    break
+                pendentes.append(self._processos.submit(funcao, *argumentos, lote))
+            if not pendentes:
+                return
+            yield from pendentes.popleft().result()
+
+    def menores_caminhos(self, pares):
+        # (origem, destino) -> (tempo, caminho), como Grafo.menor_caminho.
+        return self._distribuir(_menores_caminhos, pares)
+
+    def rotas(self, pedidos):
+        # (hospital, ocorrência) -> dicionário de resultado do MotorDespacho.
+        if not self._com_motor:
+            raise RuntimeError("Crie o ExecutorParalelo com `hospitais` para calcular rotas de despacho.")
+        return self._distribuir(_rotas, pedidos)
+
+    def mapear(self, funcao, itens, tamanho_lote=None):
+        # Tarefas arbitrárias sobre o grafo compartilhado: cada lote vira uma
+        # chamada funcao(grafo, lote) num trabalhador, que devolve uma lista
+        # de resultados. `funcao` precisa ser importável (definida no nível
+        # de um módulo) para chegar aos processos.
+        return self._distribuir(_aplicar, itens, funcao, tamanho_lote=tamanho_lote)
+
+    def _liberar_memoria(self):
+        self._memoria.close()
+        self._memoria.unlink()
+
+    def fechar(self):
+        self._processos.shutdown()
+        self._liberar_memoria()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *erro):
+        self.fechar()
@@ -0,0 +1,118 @@
+from array import array
+from bisect import bisect_left, bisect_right
+
+
+# Minutos num dia: os pesos do grafo são tempos em minutos, e os perfis se
+# repetem a cada período.
+PERIODO = 24 * 60
+
+
+class PerfisHorario:
+    # Perfis de tempo de percurso ao longo do dia, lineares por partes. Um
+    # perfil é uma lista de pontos (instante, fator): no instante dado a rua
+    # leva `peso * fator`, e entre dois pontos o fator varia linearmente (do
+    # último ponto para o primeiro, atravessando a meia-noite). Perfis iguais
+    # são guardados uma vez só e compartilhados pelas ruas que os usam.
+    #
+    # Tudo fica em arrays, no estilo do CSR: os pontos do perfil p estão em
+    # instantes/fatores[inicios[p]:inicios[p + 1]], e perfil_de[k] diz qual
+    # perfil a aresta k do CSR usa (-1 para peso fixo). Cada trecho entre
+    # dois pontos já fica como reta (base + inclinacao * t), então avaliar um
+    # perfil é uma busca binária e uma multiplicação. Um perfil com n pontos
+    # tem n + 1 trechos (antes do primeiro e depois do último contam
+    # separado), e o trecho i do perfil p está na posição i + p.
+    #
+    # Para dispensar até a busca binária, `trechos` guarda, para cada minuto
+    # inteiro do período, o trecho em que ele cai: trechos[p * periodo + m]
+    # vale para todo t em [m, m + 1), ou -1 se um ponto do perfil cai dentro
+    # desse minuto (aí sim é preciso a busca).
+    def __init__(self, arestas, periodo=PERIODO):
+        self.periodo = periodo
+        self.perfil_de = array('q', [-1]) * arestas
+        self.inicios = array('q', [0])
+        self.instantes = array('d')
+        self.fatores = array('d')
+        self.bases = array('d')
+        self.inclinacoes = array('d')
+        self.trechos = array('q')
+        self._ids = {}
+
+    def perfil(self, instantes, fatores):
+        # Id do perfil com esses pontos, criando-o se ainda não existir.
+        chave = (tuple(instantes), tuple(fatores))
+        if chave in self._ids:
+            return self._ids[chave]
+        if not instantes or len(instantes) != len(fatores):
+            raise ValueError("O perfil precisa de ao menos um ponto e de um fator por instante.")
+        if any(not 0 <= t < self.periodo for t in instantes) or list(instantes) != sorted(set(instantes)):
+            raise ValueError(f"Os instantes devem ser crescentes e estar em [0, {self.periodo}).")
+        if any(fator <= 0 for fator in fatores):
+            raise ValueError("Os fatores devem ser positivos.")
+
+        pontos = list(zip(instantes, fatores))
+        ultimo, primeiro = pontos[-1], pontos[0]
+        pontos = [(ultimo[0] - self.periodo, ultimo[1])] + pontos + [(primeiro[0] + self.periodo, primeiro[1])]
+        for (t0, f0), (t1, f1) in zip(pontos, pontos[1:]):
+            inclinacao = (f1 - f0) / (t1 - t0)
+            self.bases.append(f0 - inclinacao * t0)
+            self.inclinacoes.append(inclinacao)
+
+        perfil = len(self.inicios) - 1
+        primeiro_trecho = len(self.instantes) + perfil
+        for minuto in range(self.periodo):
+            i = bisect_right(instantes, minuto)
+            dentro = bisect_left(instantes, minuto + 1) > i
+            self.trechos.append(-1 if dentro else primeiro_trecho + i)
+
+        self.instantes.extend(instantes)
+        self.fatores.extend(fatores)
+        self.inicios.append(len(self.instantes))
+        self._ids[chave] = perfil
+        return perfil
+
+    def _segmentos(self, perfil):
+        a, b = self.inicios[perfil], self.inicios[perfil + 1]
+        for i in range(a, b):
+            proximo = i + 1 if i + 1 < b else a
+            duracao = self.instantes[proximo] - self.instantes[i]
+            if proximo == a:
+                duracao += self.periodo
+            yield self.fatores[i], self.fatores[proximo], duracao
+
+    @classmethod
+    def de_arrays(cls, perfil_de, inicios, instantes, fatores, periodo=PERIODO):
+        # Reconstrói os perfis a partir dos arrays gravados (ver
+        # GrafoCompacto.escrever_binario); as retas e os trechos por minuto
+        # são recalculados.
+        perfis = cls(0, periodo)
+        for p in range(len(inicios) - 1):
+            a, b = inicios[p], inicios[p + 1]
+            perfis.perfil(list(instantes[a:b]), list(fatores[a:b]))
+        perfis.perfil_de = array('q', perfil_de)
+        return perfis
+
+    def verificar(self, perfil, peso):
+        # Quem sai mais tarde não pode chegar antes (propriedade FIFO); sem
+        # isso o Dijkstra dependente do horário deixa de ser exato. Em termos
+        # do perfil: o tempo de percurso não pode cair mais rápido que o relógio.
+        for fator_inicial, fator_final, duracao in self._segmentos(perfil):
+            if (fator_final - fator_inicial) * peso / duracao < -1:
+                raise ValueError("Perfil viola a propriedade FIFO para esta rua: o tempo cai rápido demais.")
+
+    def verificar_peso(self, aresta, peso):
+        # Um novo peso fixo para uma rua com perfil também precisa manter a
+        # propriedade FIFO.
+        perfil = self.perfil_de[aresta]
+        if perfil >= 0:
+            self.verificar(perfil, peso)
+
+    def atribuir(self, aresta, perfil, peso):
+        self.verificar(perfil, peso)
+        self.perfil_de[aresta] = perfil
+
+    def fator(self, perfil, instante):
+        t = instante % self.periodo
+        trecho = self.trechos[perfil * self.periodo + int(t)]
+        if trecho < 0:
+            trecho = bisect_right(self.instantes, t, self.inicios[perfil], self.inicios[perfil + 1]) + perfil
+        return self.bases[trecho] + self.inclinacoes[trecho] * t
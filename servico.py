@@ -0,0 +1,211 @@
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from motor import carregar_grafo, resultado_rota, validar_pedido
+
+
+# Serviço de rotas de longa duração, sem interface gráfica. Fala um
+# protocolo de linhas JSON, por um socket local ou por stdin/stdout:
+#
+#     -> {"id": 1, "hospital": "UPA de Inoã", "ocorrencia": "Rua Abreu Rangel"}
+#     -> {"id": 3, "hospital": "UPA de Inoã", "posicao": [0.3, -0.8]}
+#     <- {"id": 1, "hospital": ..., "tempo_ida": ..., "caminho": [...]}
+#     -> {"id": 2, "comando": "estatisticas"}
+#
+# As respostas levam o mesmo "id" do pedido e podem sair fora de ordem.
+# Como as ruas são de mão dupla, a árvore de menores caminhos do hospital
+# responde a ida e a volta; pedidos simultâneos do mesmo hospital (inclusive
+# idênticos) esperam uma única execução do dijkstra. As buscas, o encaixe
+# de coordenadas (que monta o índice espacial na primeira vez) e a
+# reconstrução dos caminhos rodam numa thread separada, então o laço de
+# eventos continua atendendo enquanto isso.
+
+
+class ServicoRotas:
+    def __init__(self, grafo, amostras_latencia=100_000):
+        self.grafo = grafo
+        # Uma thread só: o grafo e os caches dele não são seguros para acesso
+        # concorrente, e as buscas são limitadas pela CPU de qualquer forma.
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._em_andamento = {}
+        self._latencias = deque(maxlen=amostras_latencia)
+        self.pedidos = 0
+        self.buscas = 0
+        self.agrupados = 0
+
+    async def arvore(self, origem):
+        # (distancias, anteriores) de grafo.dijkstra(origem), calculada uma
+        # vez para todos os pedidos que chegarem enquanto ela estiver em curso.
+        chave = (origem, self.grafo.versao)
+        tarefa = self._em_andamento.get(chave)
+        if tarefa is not None:
+            self.agrupados += 1
+            return await asyncio.shield(tarefa)
+
+        self.buscas += 1
+        laco = asyncio.get_running_loop()
+        tarefa = laco.run_in_executor(self._executor, self.grafo.dijkstra, origem)
+        self._em_andamento[chave] = tarefa
+        try:
+            return await asyncio.shield(tarefa)
+        finally:
+            if self._em_andamento.get(chave) is tarefa:
+                del self._em_andamento[chave]
+
+    async def rota(self, hospital, destino):
+        # `destino` é o nome do local ou uma coordenada (x, y), encaixada no
+        # local mais próximo.
+        inicio = time.perf_counter()
+        self.pedidos += 1
+        laco = asyncio.get_running_loop()
+        try:
+            if isinstance(destino, tuple):
+                try:
+                    destino = await laco.run_in_executor(self._executor, self.grafo.local_mais_proximo, destino)
+                except ValueError as erro:
+                    return {'hospital': hospital, 'ocorrencia': destino, 'erro': str(erro)}
+            erro = validar_pedido(self.grafo, hospital, destino)
+            if erro:
+                return {'hospital': hospital, 'ocorrencia': destino, 'erro': erro}
+
+            distancias, anteriores = await self.arvore(hospital)
+            caminho_ida = await laco.run_in_executor(
+                self._executor, self.grafo.reconstruir_caminho, anteriores, destino)
+            if caminho_ida and caminho_ida[0] != hospital:
+                caminho_ida = []
+            tempo = distancias[destino]
+            return resultado_rota(hospital, destino, tempo, caminho_ida, tempo, caminho_ida[::-1])
+        finally:
+            self._latencias.append(time.perf_counter() - inicio)
+
+    def estatisticas(self):
+        latencias = sorted(self._latencias)
+
+        def percentil(p):
+            if not latencias:
+                return 0.0
+            return latencias[min(len(latencias) - 1, int(p / 100 * len(latencias)))] * 1e3
+
+        return {
+            'pedidos': self.pedidos,
+            'buscas': self.buscas,
+            'agrupados': self.agrupados,
+            'latencia_ms': {'p50': percentil(50), 'p90': percentil(90), 'p99': percentil(99),
+                            'max': latencias[-1] * 1e3 if latencias else 0.0},
+            'cache': self.grafo.estatisticas_cache(),
+        }
+
+    async def responder(self, linha):
+        # Uma linha do protocolo -> dicionário de resposta.
+        try:
+            pedido = json.loads(linha)
+        except ValueError:
+            return {'erro': "Linha não é um JSON válido."}
+        if not isinstance(pedido, dict):
+            return {'erro': "O pedido deve ser um objeto JSON."}
+
+        if pedido.get('comando') == 'estatisticas':
+            resposta = self.estatisticas()
+        elif 'comando' in pedido:
+            resposta = {'erro': f"Comando desconhecido: {pedido['comando']}"}
+        else:
+            destino = pedido.get('ocorrencia') or ''
+            if not destino and isinstance(pedido.get('posicao'), list) and len(pedido['posicao']) == 2:
+                destino = tuple(pedido['posicao'])
+            resposta = await self.rota(pedido.get('hospital') or '', destino)
+        if 'id' in pedido:
+            resposta = {'id': pedido['id'], **resposta}
+        return resposta
+
+    async def atender(self, leitor, escrever):
+        # Lê pedidos de `leitor` (StreamReader) e atende cada um numa tarefa
+        # própria, para que um pedido lento não segure os seguintes.
+        pendentes = set()
+
+        async def atender_linha(linha):
+            resposta = await self.responder(linha)
+            await escrever(json.dumps(resposta, ensure_ascii=False) + '\n')
+
+        while True:
+            linha = await leitor.readline()
+            if not linha:
+                break
+            if not linha.strip():
+                continue
+            tarefa = asyncio.create_task(atender_linha(linha))
+            pendentes.add(tarefa)
+            tarefa.add_done_callback(pendentes.discard)
+
+        if pendentes:
+            await asyncio.gather(*pendentes)
+
+    def fechar(self):
+        self._executor.shutdown()
+
+
+async def servir_socket(servico, host='127.0.0.1', porta=0, pronto=None):
+    # Cada conexão é um fluxo de linhas JSON. `pronto(porta)` é chamado assim
+    # que o socket está aceitando conexões (útil com porta=0, efêmera).
+    async def conexao(leitor, escritor):
+        async def escrever(texto):
+            escritor.write(texto.encode('utf-8'))
+            await escritor.drain()
+
+        try:
+            await servico.atender(leitor, escrever)
+        except ConnectionError:
+            pass
+        finally:
+            escritor.close()
+
+    servidor = await asyncio.start_server(conexao, host, porta, limit=2 ** 20)
+    if pronto is not None:
+        pronto(servidor.sockets[0].getsockname()[1])
+    async with servidor:
+        await servidor.serve_forever()
+
+
+async def servir_stdio(servico):
+    laco = asyncio.get_running_loop()
+    leitor = asyncio.StreamReader(limit=2 ** 20)
+    await laco.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(leitor), sys.stdin)
+
+    async def escrever(texto):
+        sys.stdout.write(texto)
+        sys.stdout.flush()
+
+    await servico.atender(leitor, escrever)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serviço de rotas de ambulância com protocolo de linhas JSON.")
+    parser.add_argument('-g', '--grafo',
+                        help="grafo em .csv (origem,destino,peso), .jsonl, .osm ou .grafo (binário); padrão: marica.grafo, se existir, senão Maricá")
+    parser.add_argument('--porta', type=int,
+                        help="atende num socket TCP local nesta porta; sem ela, usa stdin/stdout")
+    parser.add_argument('--host', default='127.0.0.1')
+    args = parser.parse_args(argv)
+
+    servico = ServicoRotas(carregar_grafo(args.grafo))
+    try:
+        if args.porta is None:
+            asyncio.run(servir_stdio(servico))
+        else:
+            def pronto(porta):
+                print(f"atendendo em {args.host}:{porta}", file=sys.stderr)
+
+            asyncio.run(servir_socket(servico, args.host, args.porta, pronto))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servico.fechar()
+        print(json.dumps(servico.estatisticas(), ensure_ascii=False), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
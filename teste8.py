@@ -40,9 +40,10 @@ class Grafo:
 
     def reconstruir_caminho(self, anteriores, destino):
         caminho = []
-        while destino:
-            caminho.insert(0, destino)
+        while destino is not None:
+            caminho.append(destino)
             destino = anteriores[destino]
+        caminho.reverse()
         return caminho
 
     def encontrar_hospital_mais_proximo(self, pos_ambulancia, hospitais):
@@ -0,0 +1,418 @@
+import time
+
+import matplotlib.image as mpimg
+import matplotlib.patches as mpatches
+import numpy as np
+from matplotlib.collections import LineCollection
+
+import instrumentacao
+
+
+# Animação de rotas sobre o mapa com blitting: o fundo (imagem da cidade e
+# grafo) é desenhado uma vez e guardado como pixels; a cada quadro só são
+# redesenhados o marcador da ambulância, o trecho já percorrido e os textos.
+# Assim o custo de um quadro depende do tamanho do caminho, não da cidade.
+# O pyplot só é importado no modo interativo; a exportação (exportacao.py)
+# desenha em figuras Agg, sem janela.
+
+IMAGEM_MARICA = "mapa_marica.png"
+EXTENSAO_MARICA = (-1, 7, -3, 3)
+
+# Acima deste número de locais (ou de ruas) na área visível, os nomes (ou os
+# tempos) não são escritos: em redes grandes só aparecem com zoom.
+LIMITE_ROTULOS = 200
+RUAS_POR_TRACO = 1000
+
+# Imagens de fundo já lidas, por arquivo.
+_imagens = {}
+
+
+def carregar_imagem(caminho):
+    if caminho not in _imagens:
+        _imagens[caminho] = mpimg.imread(caminho)
+    return _imagens[caminho]
+
+
+class CamadaAnimada:
+    # Blitting sobre uma figura: a cada desenho completo (primeira exibição,
+    # redimensionamento) os pixels do fundo são copiados; depois, atualizar()
+    # só restaura essa cópia e desenha por cima os artistas animados.
+    def __init__(self, figura):
+        self.figura = figura
+        self.canvas = figura.canvas
+        self.artistas = []
+        self._fundo = None
+        self.canvas.mpl_connect('draw_event', self._ao_desenhar)
+
+    def adicionar(self, artista):
+        # Artistas animados ficam de fora do desenho completo.
+        artista.set_animated(True)
+        self.artistas.append(artista)
+        return artista
+
+    def remover(self, artista):
+        self.artistas.remove(artista)
+        artista.remove()
+
+    def _ao_desenhar(self, evento):
+        self._fundo = self.canvas.copy_from_bbox(self.figura.bbox)
+        self._desenhar_artistas()
+
+    def _desenhar_artistas(self):
+        for artista in self.artistas:
+            self.figura.draw_artist(artista)
+
+    def atualizar(self):
+        if self._fundo is None:
+            with instrumentacao.etapa('visualizacao.desenho_completo'):
+                self.canvas.draw()
+        else:
+            with instrumentacao.etapa('visualizacao.quadro'):
+                self.canvas.restore_region(self._fundo)
+                self._desenhar_artistas()
+                self.canvas.blit(self.figura.bbox)
+
+
+class MapaEstatico:
+    # Fundo compartilhado pelas animações: imagem da cidade, ruas com os
+    # tempos, locais e hospitais. Não depende da rota.
+    #
+    # As ruas saem direto dos arrays CSR do grafo, como um único
+    # LineCollection, e os locais como um scatter por cor; o custo de montar o
+    # mapa é o de algumas operações numpy, mesmo com centenas de milhares de
+    # ruas. Nomes e tempos são textos (um artista cada), então só são criados
+    # para o que está na área visível, e refeitos a cada zoom.
+    def __init__(self, grafo, hospitais, imagem=IMAGEM_MARICA, extensao=EXTENSAO_MARICA,
+                 limite_rotulos=LIMITE_ROTULOS, figura=None):
+        self.grafo = grafo
+        self.posicoes = grafo.posicoes
+        self.limite_rotulos = limite_rotulos
+        imagem_mapa = carregar_imagem(imagem) if imagem is not None else None
+
+        if figura is None:
+            import matplotlib.pyplot as plt
+            figura = plt.figure(figsize=(10, 8))
+        self.figura = figura
+        self.eixos = figura.add_subplot()
+        self.figura.subplots_adjust(bottom=0.25)
+        self.eixos.set_axis_off()
+        if imagem_mapa is not None:
+            self.eixos.imshow(imagem_mapa, extent=extensao, aspect='auto', zorder=0)
+        with instrumentacao.etapa('visualizacao.mapa_estatico'):
+            self._desenhar_grafo(hospitais)
+        if imagem_mapa is None:
+            self.eixos.autoscale_view()
+
+        self._rotulos = []
+        self._atualizar_rotulos()
+        self.eixos.callbacks.connect('xlim_changed', self._atualizar_rotulos)
+        self.eixos.callbacks.connect('ylim_changed', self._atualizar_rotulos)
+        self.camada = CamadaAnimada(self.figura)
+
+    def _desenhar_grafo(self, hospitais):
+        g = self.grafo.como_compacto()
+        n = len(g)
+        if g.xs is None:
+            raise ValueError("O grafo precisa das posições dos locais para ser desenhado.")
+        xs = np.asarray(g.xs, dtype=float)
+        ys = np.asarray(g.ys, dtype=float)
+        inicios = np.asarray(g.inicios, dtype=np.int64)
+        destinos = np.asarray(g.destinos, dtype=np.int64)
+        pesos = np.asarray(g.pesos)
+
+        # Cada rua aparece nas duas direções do CSR; fica só a de origem < destino.
+        origens = np.repeat(np.arange(n), np.diff(inicios))
+        ida = (origens < destinos) & np.isfinite(xs[origens]) & np.isfinite(ys[origens]) \
+            & np.isfinite(xs[destinos]) & np.isfinite(ys[destinos])
+        origens, destinos = origens[ida], destinos[ida]
+        # Um segmento por rua, separados por NaN (o traço é interrompido), em
+        # blocos de RUAS_POR_TRACO: o LineCollection fica com poucos traços
+        # longos em vez de um objeto Path por rua.
+        vertices = np.full((len(origens), 3, 2), np.nan)
+        vertices[:, 0, 0], vertices[:, 0, 1] = xs[origens], ys[origens]
+        vertices[:, 1, 0], vertices[:, 1, 1] = xs[destinos], ys[destinos]
+        self._meios = vertices[:, :2].mean(axis=1)
+        self._pesos = pesos[ida]
+        vertices = vertices.reshape(-1, 2)
+        tracos = [vertices[i:i + 3 * RUAS_POR_TRACO] for i in range(0, len(vertices), 3 * RUAS_POR_TRACO)]
+        self.eixos.add_collection(LineCollection(tracos, colors='black', linewidths=1, zorder=1))
+
+        # Em redes grandes, círculos do tamanho dos de Maricá cobririam tudo.
+        self.tamanho_nos = 800 if n <= self.limite_rotulos else 4
+        com_posicao = np.flatnonzero(np.isfinite(xs) & np.isfinite(ys))
+        hospital = np.zeros(n, dtype=bool)
+        hospital[[g.indices[nome] for nome in hospitais if nome in g.indices]] = True
+        # Um scatter por cor: com cor única o matplotlib desenha todos os
+        # marcadores de uma vez, em vez de um por um.
+        for cor, selecao in (('lightblue', ~hospital), ('green', hospital)):
+            nos = com_posicao[selecao[com_posicao]]
+            self.eixos.scatter(xs[nos], ys[nos], s=self.tamanho_nos, c=cor, zorder=2)
+        self._nos = np.column_stack([xs[com_posicao], ys[com_posicao]])
+        self._nomes = [g.nomes[i] for i in com_posicao]
+
+    def _visiveis(self, pontos):
+        x0, x1 = sorted(self.eixos.get_xlim())
+        y0, y1 = sorted(self.eixos.get_ylim())
+        return np.flatnonzero((pontos[:, 0] >= x0) & (pontos[:, 0] <= x1)
+                              & (pontos[:, 1] >= y0) & (pontos[:, 1] <= y1))
+
+    def _atualizar_rotulos(self, eixos=None):
+        for rotulo in self._rotulos:
+            rotulo.remove()
+        self._rotulos = []
+        ax = self.eixos
+
+        nos = self._visiveis(self._nos)
+        if len(nos) <= self.limite_rotulos:
+            for i in nos.tolist():
+                x, y = self._nos[i]
+                self._rotulos.append(ax.text(x, y, self._nomes[i], fontsize=12,
+                                             ha='center', va='center', zorder=3))
+
+        ruas = self._visiveis(self._meios)
+        if len(ruas) <= self.limite_rotulos:
+            caixa = dict(boxstyle='round', ec='white', fc='white')
+            for k in ruas.tolist():
+                x, y = self._meios[k]
+                self._rotulos.append(ax.text(x, y, f"{self._pesos[k]:g}", fontsize=10, ha='center',
+                                             va='center', bbox=caixa, zorder=1))
+
+
+class AnimacaoRota:
+    # Uma rota sobre um MapaEstatico. Todos os artistas são criados uma vez
+    # e só têm os dados trocados em cada quadro.
+    def __init__(self, mapa, ambulancia, caminho, tempo_total):
+        self.mapa = mapa
+        self.caminho = caminho
+        self.tempo_total = tempo_total
+        self.xs = [mapa.posicoes[no][0] for no in caminho]
+        self.ys = [mapa.posicoes[no][1] for no in caminho]
+        self.quadros = len(caminho)
+
+        ax, camada = mapa.eixos, mapa.camada
+        x, y = mapa.posicoes[ambulancia]
+        self._artistas = [
+            # Local de partida em amarelo, como os demais nós do mapa.
+            camada.adicionar(ax.scatter([x], [y], s=mapa.tamanho_nos, c='yellow', zorder=3)),
+            camada.adicionar(ax.text(x, y, ambulancia, fontsize=12, ha='center', va='center', zorder=4)),
+        ]
+        self.percorrido, = ax.plot([], [], color='red', linewidth=3, zorder=5)
+        self.marcador = mpatches.Circle((self.xs[0], self.ys[0]), 0.1, color='red', zorder=10)
+        ax.add_patch(self.marcador)
+        caixa = dict(facecolor='white', alpha=0.8)
+        self.textos = [
+            ax.text(0.5, 1.08, "", transform=ax.transAxes, fontsize=12, ha='center', va='top', bbox=caixa),
+            ax.text(0.5, 1.01, "", transform=ax.transAxes, fontsize=12, ha='center', va='top', bbox=caixa),
+            ax.text(0.5, 0.94, "", transform=ax.transAxes, fontsize=11, ha='center', va='top', bbox=caixa),
+        ]
+        for artista in [self.percorrido, self.marcador, *self.textos]:
+            self._artistas.append(camada.adicionar(artista))
+
+    def desenhar_quadro(self, quadro):
+        caminho = self.caminho
+        self.percorrido.set_data(self.xs[:quadro + 1], self.ys[:quadro + 1])
+        self.marcador.set_center((self.xs[quadro], self.ys[quadro]))
+        self.textos[0].set_text(f"Local atual: {caminho[quadro]}")
+        self.textos[1].set_text(f"Tempo estimado: {self.tempo_total} minutos")
+        self.textos[2].set_text(f"Caminho restante: {' → '.join(caminho[quadro:])}")
+        self.mapa.camada.atualizar()
+
+    def remover(self):
+        for artista in self._artistas:
+            self.mapa.camada.remover(artista)
+        self._artistas = []
+
+
+def _texto_contagem(mapa):
+    return mapa.camada.adicionar(mapa.eixos.text(0.5, 0.5, "", transform=mapa.eixos.transAxes, fontsize=50,
+                                                 ha='center', va='center', color='red'))
+
+
+def contagem_regressiva(mapa, segundos=3):
+    import matplotlib.pyplot as plt
+    texto = _texto_contagem(mapa)
+    for i in range(segundos, 0, -1):
+        texto.set_text(str(i))
+        mapa.camada.atualizar()
+        plt.pause(1)
+    mapa.camada.remover(texto)
+
+
+def animar_rota(grafo, ambulancia, hospitais, caminho, tempo_total, intervalo=2100):
+    import matplotlib.pyplot as plt
+    try:
+        mapa = MapaEstatico(grafo, hospitais)
+    except FileNotFoundError:
+        from tkinter import messagebox
+        messagebox.showerror("Erro", "Arquivo 'mapa_marica.png' não encontrado. Coloque a imagem na mesma pasta do script.")
+        return
+
+    contagem_regressiva(mapa)
+    animacao = AnimacaoRota(mapa, ambulancia, caminho, tempo_total)
+    quadros = iter(range(animacao.quadros))
+
+    def avancar():
+        quadro = next(quadros, None)
+        if quadro is None:
+            temporizador.stop()
+        else:
+            animacao.desenhar_quadro(quadro)
+
+    temporizador = mapa.figura.canvas.new_timer(interval=intervalo)
+    temporizador.add_callback(avancar)
+    avancar()
+    temporizador.start()
+    plt.show()
+
+
+def _janela_mapa(mestre, grafo, hospitais, titulo):
+    # Toplevel com o canvas do matplotlib e um MapaEstatico desenhado nele.
+    import tkinter as tk
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+    from matplotlib.figure import Figure
+
+    janela = tk.Toplevel(mestre)
+    janela.title(titulo)
+    try:
+        figura = Figure(figsize=(10, 8))
+        # O canvas Tk vem antes do mapa: a camada de blitting se liga a ele.
+        canvas = FigureCanvasTkAgg(figura, master=janela)
+        mapa = MapaEstatico(grafo, hospitais, figura=figura)
+    except BaseException:
+        janela.destroy()
+        raise
+    # Com a barra, o zoom mostra nomes e tempos das ruas em redes grandes.
+    NavigationToolbar2Tk(canvas, janela).update()
+    canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+    return janela, mapa
+
+
+class RastreamentoFrota:
+    # Várias ambulâncias no mesmo mapa, todas num único scatter. Cada uma
+    # segue seu caminho num relógio simulado (minutos de rota por segundo
+    # real), com a posição interpolada ao longo da rua em proporção ao tempo
+    # (peso) dela, em vez de saltar de nó em nó.
+    #
+    # As trajetórias ficam concatenadas em arrays, com os tempos acumulados
+    # de cada uma deslocados para não se sobreporem às das anteriores; assim
+    # a posição de todas as ambulâncias sai de uma só busca binária
+    # vetorizada, sem laço em Python por ambulância. Os arrays só são
+    # refeitos quando uma viagem entra ou sai.
+    def __init__(self, mapa, minutos_por_segundo=1.0, relogio=time.monotonic):
+        self.mapa = mapa
+        self.minutos_por_segundo = minutos_por_segundo
+        self.relogio = relogio
+        self._inicio = relogio()
+        self.viagens = {}
+        self._proximo_id = 0
+        self._arrays = None
+
+        ax, camada = mapa.eixos, mapa.camada
+        self.marcadores = camada.adicionar(ax.scatter(np.empty(0), np.empty(0), s=max(mapa.tamanho_nos / 6, 20),
+                                                      c='red', edgecolors='white', zorder=10))
+        self.texto = camada.adicionar(ax.text(0.5, 1.01, "", transform=ax.transAxes, fontsize=12, ha='center',
+                                              va='bottom', bbox=dict(facecolor='white', alpha=0.8)))
+
+    def agora(self):
+        # Minutos simulados desde a criação.
+        return (self.relogio() - self._inicio) * self.minutos_por_segundo
+
+    def adicionar(self, caminho, partida=None):
+        # Começa uma viagem pelo caminho (lista de locais) no instante
+        # `partida` (padrão: agora) e devolve o id dela.
+        if not caminho:
+            raise ValueError("A viagem precisa de ao menos um local no caminho.")
+        grafo, posicoes = self.mapa.grafo, self.mapa.posicoes
+        tempos = [0]
+        for origem, destino in zip(caminho, caminho[1:]):
+            tempos.append(tempos[-1] + grafo.peso(origem, destino))
+        if len(caminho) == 1:
+            caminho, tempos = caminho * 2, tempos * 2
+        viagem = (np.array([posicoes[no][0] for no in caminho]), np.array([posicoes[no][1] for no in caminho]),
+                  np.array(tempos, dtype=float), self.agora() if partida is None else partida)
+        self._proximo_id += 1
+        self.viagens[self._proximo_id] = viagem
+        self._arrays = None
+        return self._proximo_id
+
+    def remover(self, viagem):
+        del self.viagens[viagem]
+        self._arrays = None
+
+    def concluidas(self, agora=None):
+        agora = self.agora() if agora is None else agora
+        return [viagem for viagem, (_, _, tempos, partida) in self.viagens.items() if agora - partida >= tempos[-1]]
+
+    def _montar(self):
+        if self._arrays is None:
+            viagens = list(self.viagens.values())
+            tamanhos = np.array([len(tempos) for _, _, tempos, _ in viagens], dtype=np.int64)
+            totais = np.array([tempos[-1] for _, _, tempos, _ in viagens])
+            inicios = np.concatenate([[0], np.cumsum(tamanhos)[:-1]]).astype(np.int64)
+            deslocamentos = np.concatenate([[0.0], np.cumsum(totais + 1)[:-1]])
+            if viagens:
+                xs = np.concatenate([xs for xs, _, _, _ in viagens])
+                ys = np.concatenate([ys for _, ys, _, _ in viagens])
+                tempos = np.concatenate([tempos + deslocamento
+                                         for (_, _, tempos, _), deslocamento in zip(viagens, deslocamentos)])
+            else:
+                xs = ys = tempos = np.empty(0)
+            partidas = np.array([partida for _, _, _, partida in viagens])
+            self._arrays = (xs, ys, tempos, inicios, inicios + tamanhos, totais, deslocamentos, partidas)
+        return self._arrays
+
+    def posicoes(self, agora=None):
+        # Array (N, 2) com a posição de cada viagem, na ordem de `viagens`.
+        agora = self.agora() if agora is None else agora
+        xs, ys, tempos, inicios, fins, totais, deslocamentos, partidas = self._montar()
+        if not len(partidas):
+            return np.empty((0, 2))
+        alvo = np.clip(agora - partidas, 0, totais) + deslocamentos
+        # Trecho k-1 -> k em que cada ambulância está.
+        k = np.clip(np.searchsorted(tempos, alvo, side='right'), inicios + 1, fins - 1)
+        duracao = tempos[k] - tempos[k - 1]
+        fracao = np.where(duracao > 0, (alvo - tempos[k - 1]) / np.where(duracao > 0, duracao, 1), 1.0)
+        fracao = np.clip(fracao, 0, 1)
+        return np.column_stack([xs[k - 1] + fracao * (xs[k] - xs[k - 1]),
+                                ys[k - 1] + fracao * (ys[k] - ys[k - 1])])
+
+    def desenhar(self, agora=None):
+        agora = self.agora() if agora is None else agora
+        with instrumentacao.etapa('visualizacao.posicoes_frota'):
+            posicoes = self.posicoes(agora)
+        self.marcadores.set_offsets(posicoes)
+        self.texto.set_text(f"{len(self.viagens)} ambulâncias em rota — {agora:.0f} min")
+        self.mapa.camada.atualizar()
+
+
+class JanelaFrota:
+    # Uma janela para todas as ambulâncias em rota, com um único laço de
+    # desenho: um after() a cada quadro, enquanto houver viagens. Quem chega
+    # de volta ao hospital sai do mapa. Deve ser usada na thread do Tk.
+    def __init__(self, mestre, grafo, hospitais, quadros_por_segundo=30, minutos_por_segundo=1.0,
+                 titulo="Ambulâncias em rota"):
+        self.janela, self.mapa = _janela_mapa(mestre, grafo, hospitais, titulo)
+        self.frota = RastreamentoFrota(self.mapa, minutos_por_segundo)
+        self.intervalo = max(1, round(1000 / quadros_por_segundo))
+        self._agendado = None
+        self.janela.protocol("WM_DELETE_WINDOW", self.fechar)
+        self.frota.desenhar()
+
+    def adicionar(self, caminho):
+        viagem = self.frota.adicionar(caminho)
+        if self._agendado is None:
+            self._passo()
+        return viagem
+
+    def _passo(self):
+        agora = self.frota.agora()
+        for viagem in self.frota.concluidas(agora):
+            self.frota.remover(viagem)
+        self.frota.desenhar(agora)
+        self._agendado = self.janela.after(self.intervalo, self._passo) if self.frota.viagens else None
+
+    def fechar(self):
+        if self._agendado is not None:
+            self.janela.after_cancel(self._agendado)
+            self._agendado = None
+        self.janela.destroy()